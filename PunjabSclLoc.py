@@ -1,12 +1,36 @@
 import streamlit as st
 import folium
 from streamlit_folium import st_folium
+from folium.plugins import HeatMap
 import json
 import pandas as pd
-import math
-import requests
+import numpy as np
 import os
 from dotenv import load_dotenv
+from geo_distance import haversine_km
+from classification import SCHOOL_STATUS_STYLE, ThresholdClassifier, status_counts
+from data_cache import data_version, load_table
+from diagnostics import RerunTimer, append_jsonl
+from remote_data import fetch_csv
+from density_raster import ensure_density_raster
+from heatmap_pyramid import HeatmapPyramid
+from streaming_stats import array_stats
+from catchment import catchment_population
+from population_coverage import distance_raster, raster_coverage
+from upgrade_planner import plan_upgrades
+from road_network import load_road_graph
+from school_layer import SchoolLayer, school_feature_collection
+from viewport import BBoxIndex, aggregate_points, bounds_to_bbox, degrees_per_pixel
+
+HEATMAP_MAX_POINTS = 20_000  # Upper bound on heatmap points sent to the browser
+VIEWPORT_MARGIN = 0.25  # Extra fraction of the view rendered on every side, so small pans need no rerun data
+SCHOOL_DETAIL_ZOOM = 11  # From this zoom the schools in view are sent individually, below it as aggregates
+SCHOOL_AGGREGATE_PX = 40  # Aggregate cell size in screen pixels
+SCHOOL_CLICK_PX = 10  # Clicks within this many pixels of a school marker select it
+CATCHMENT_RADIUS_KM = 5.0  # Radius of the population catchment around each school
+
+SCHOOLS_CSV = '/Users/muhammadwisalabdullah/Downloads/PunjabLoc.csv'
+POPULATION_CSV = '/Users/muhammadwisalabdullah/Downloads/file3.csv'
 
 # Load environment variables from .env file
 load_dotenv()
@@ -14,119 +38,26 @@ load_dotenv()
 API_KEY = os.getenv('API_KEY')
 DATABASE_URL = os.getenv('DATABASE_URL')
 SECRET_KEY = os.getenv('SECRET_KEY')
+# Optional local OSM road extract (.osm.pbf or .geojson) for travel distances instead of straight lines
+ROADS_FILE = os.getenv('ROADS_FILE')
 
 #data_url1 = "https://raw.githubusercontent.com/wisabd/Data_PMIU/blob/main/PunjabLoc.csv"
 #data_url2 = "https://raw.githubusercontent.com/wisabd/Data_PMIU/blob/main/file3.csv"
 
-@st.cache_data
+# In-memory copy for 10 minutes, after that a conditional request revalidates the disk copy
+@st.cache_data(ttl=600)
 def load_data_from_gh(data_url):
     try:
-        # Send request with authentication
+        # Send request with authentication; payload is cached on disk by URL and only
+        # re-downloaded when the ETag / Last-Modified of the remote file changes
         headers = {'Authorization': f'token {API_KEY}'}
-        response = requests.get(data_url, headers=headers)
-        response.raise_for_status()  # Raise an     error for bad status codes
-
-        # Read the CSV data from the response
-        df = pd.read_csv(pd.compat.StringIO(response.text))
+        df = fetch_csv(data_url, headers=headers)
         return df
     except Exception as e:
         st.error(f"Failed to load data: {e}")
         return None
 
 
-upgrade_candidates = []
-lowenrol = []
-
-# --- HAVERSINE AND PROXIMITY FUNCTIONS ---
-def haversine_distance(lat1, lon1, lat2, lon2):
-    """Calculate the great-circle distance between two points."""
-    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-    a = (math.sin(dlat / 2) ** 2 +
-         math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2)
-    c = 2 * math.asin(math.sqrt(a))
-    return c * 6371  # Earth radius in km
-
-def is_point_in_box(test_lat, test_lon, min_lat, min_lon, max_lat, max_lon):
-    """Checks if a point is inside a bounding box."""
-    return (min_lat <= test_lat <= max_lat) and (min_lon <= test_lon <= max_lon)
-
-def has_nearby_high_school(middle_school_lat, middle_school_lon, high_schools_list, radius_km):
-    """
-    Check if there are any high schools within the given radius of a middle school.
-    Returns:
-        bool: True if at least one high school is found within the radius, False otherwise
-    """
-    #Calculate bounding box around the middle school for fast filtering
-    delta_lat = radius_km / 111.2
-    lat_rad = math.radians(middle_school_lat)
-    delta_lon = radius_km / (111.2 * math.cos(lat_rad))
-
-    min_lat = middle_school_lat - delta_lat
-    max_lat = middle_school_lat + delta_lat
-    min_lon = middle_school_lon - delta_lon
-    max_lon = middle_school_lon + delta_lon
-
-    # Check each high school
-    for high_school in high_schools_list:
-        hs_lat, hs_lon = high_school['lat'], high_school['lng']
-
-        # Fast bounding box check first
-        if is_point_in_box(hs_lat, hs_lon, min_lat, min_lon, max_lat, max_lon):
-            # Precise distance calculation
-            distance = haversine_distance(middle_school_lat, middle_school_lon, hs_lat, hs_lon)
-            if distance <= radius_km:
-                return True  # Found at least one high school within radius
-    return False  #No high schools found within radius
-
-
-def get_school_color(school, high_schools_list):
-    """
-    Determines the color for a school, applying the golden rule for isolated middle schools
-    with enrollment > 200.
-    Args:
-        school: Dictionary with school data including 's_level', 'lat', 'lng', 'enrolment'
-        high_schools_list: List of all high school dictionaries
-    Returns:
-        tuple: (fill_color, border_color) for the school
-    """
-    school_level = school['Level']
-    if school_level == "High":
-        fill_color = "green"
-        border_color = "darkgreen"
-    elif school_level == "Middle":
-        # Check if this middle school has ANY high schools within 5km radius
-        has_nearby_high = has_nearby_high_school(
-            school['Lat'],
-            school['Lng'],
-            high_schools_list,
-            5.0  # 5km radius
-        )
-        # Get enrollment (handle missing values)
-        enrollment = school.get('total_enrollment')
-        has_high_enrollment = pd.notna(enrollment) and enrollment > 200
-
-        if has_nearby_high:
-            # Middle school has high school(s) nearby - use default purple
-            fill_color = "yellow"
-            border_color = "yellow"
-        else:
-            # ISOLATED middle school (no high schools within 5km)
-            if has_high_enrollment:
-                # ISOLATED AND high enrollment (>200) - make it golden!
-                fill_color = "red"
-                border_color = "red"
-            else:
-                # ISOLATED but low enrollment - use a different color (e.g., orange)
-                fill_color = "blue"
-                border_color = "blue"
-    else:
-        # Default color for other school levels
-        fill_color = "black"
-        border_color = "black"
-    return fill_color, border_color
-
 # Set page configuration for full-width display
 st.set_page_config(
     page_title="Population Density Map",
@@ -135,55 +66,240 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
-# Load data
-# Data loaded from the cleaned dataframe of Pujab with no missing Lat, Lon - No UC data in this
-dataframe_pop = pd.read_csv('/Users/muhammadwisalabdullah/Downloads/PunjabLoc.csv')
-
-#Data filtered to get High schools and Middle schools for Boys using pandas
-# Filter for both High and Middle schools (Male)
-filtered_data = dataframe_pop[
-    ((dataframe_pop['Level'] == "High") | (dataframe_pop['Level'] == "Middle")) &
-    (dataframe_pop['Gender'] == "Male")
-    ]
-
-#Population data from WorldPop loaded
-records = pd.read_csv('/Users/muhammadwisalabdullah/Downloads/file3.csv')
-records['count'] = range(1, len(records) + 1)
-# Sample data creation from the population data into a dictionary format
-data = {
-    'latitude': records['Latitude'],
-    'longitude': records['Longitude'],
-    'population_density': records['Population Density at 1km'],
-}
+@st.cache_resource(show_spinner="Preparing map data...")
+def prepare_map_data(version, _timer=None):
+    """
+    Everything behind the map that depends only on the input files, shared by all sessions.
+    version is data_version of SCHOOLS_CSV, POPULATION_CSV and ROADS_FILE (when set), so
+    editing any of them rebuilds it.
+    _timer (not part of the cache key) receives the stage spans when the cache is rebuilt.
+    """
+    timer = _timer or RerunTimer(profile=False)
+
+    # Data loaded from the cleaned dataframe of Pujab with no missing Lat, Lon - No UC data in this
+    # Read through a typed Parquet copy that is rebuilt only when the CSV changes
+    timer.begin('Load schools')
+    dataframe_pop = load_table(SCHOOLS_CSV)
+
+    #Data filtered to get High schools and Middle schools for Boys using pandas
+    # Filter for both High and Middle schools (Male)
+    filtered_data = dataframe_pop[
+        ((dataframe_pop['Level'] == "High") | (dataframe_pop['Level'] == "Middle")) &
+        (dataframe_pop['Gender'] == "Male")
+        ]
+
+    #Population data from WorldPop loaded from the memory-mapped raster built from file3.csv
+    #(rebuilt only when the CSV changes, shared by all app processes through the page cache)
+    timer.end()
+    with timer.span('Density raster'):
+        density_raster = ensure_density_raster(POPULATION_CSV)
+
+        # Long-format latitude/longitude/population_density dataframe of the cells with data
+        df = density_raster.to_frame()
+
+    # Calculate statistics in one streaming pass over the raster rows (quantiles within 0.5%)
+    with timer.span('Statistics'):
+        stats = array_stats(density_raster.values).summary()
+
+    # Nearest high school distances, computed once and kept sorted so the sidebar thresholds
+    # only need binary searches
+    with timer.span('Nearest high schools'):
+        classifier = ThresholdClassifier(filtered_data)
+
+    # Same classification by road travel distance: one multi-source Dijkstra from all high schools
+    # over the road graph, compiled from the extract once and cached on disk
+    road_classifier = None
+    if ROADS_FILE:
+        with timer.span('Road travel distances'):
+            road_graph = load_road_graph(ROADS_FILE)
+            is_high = (filtered_data['Level'] == "High").to_numpy()
+            road_km = road_graph.travel_distance(
+                filtered_data['Lat'].to_numpy()[is_high], filtered_data['Lng'].to_numpy()[is_high],
+                filtered_data['Lat'], filtered_data['Lng'])
+            road_classifier = ThresholdClassifier(filtered_data, nearest_high_km=road_km)
+
+    # People living within the catchment radius of each school, from the density grid
+    with timer.span('Catchment population'):
+        catchment = catchment_population(
+            density_raster.values, density_raster.transform,
+            filtered_data['Lat'], filtered_data['Lng'], radius_km=CATCHMENT_RADIUS_KM)
+
+    # Distance from every populated cell to the nearest high school, and the share of people
+    # living within each distance
+    with timer.span('Population coverage'):
+        is_high = (filtered_data['Level'] == "High").to_numpy()
+        distance = distance_raster(density_raster, filtered_data['Lat'].to_numpy()[is_high],
+                                   filtered_data['Lng'].to_numpy()[is_high])
+        coverage, coverage_cells = raster_coverage(density_raster, distance)
+
+    timer.begin('Heatmap pyramid and school index')
+    prepared = {
+        'dataframe_pop': dataframe_pop,
+        'filtered_data': filtered_data,
+        'density_raster': density_raster,
+        'df': df,
+        'stats': stats,
+        'classifier': classifier,
+        'road_classifier': road_classifier,
+        'catchment_population': catchment,
+        'distance_raster': distance,
+        'coverage_curve': coverage,
+        'coverage_cells': coverage_cells,
+        'heatmap_pyramid': HeatmapPyramid.from_raster(density_raster),
+        'school_index': BBoxIndex(filtered_data['Lng'], filtered_data['Lat']),
+        'center': [df['latitude'].mean(), df['longitude'].mean()],
+    }
+    timer.end()
+    return prepared
+
+
+@st.cache_data(show_spinner=False)
+def coverage_csv(version, table):
+    """CSV export of prepared['coverage_curve'] or prepared['coverage_cells'], encoded once per data version."""
+    return prepare_map_data(version)[table].to_csv(index=False).encode()
 
-# Dictionary format loaded into dataframe
-df = pd.DataFrame(data)
-
-# Calculate statistics
-stats = {
-    'max': df['population_density'].max(),
-    'min': df['population_density'].min(),
-    'mean': df['population_density'].mean(),
-    'median': df['population_density'].median(),
-    'std': df['population_density'].std(),
-    'total_points': len(df),
-    'q25': df['population_density'].quantile(0.25),
-    'q75': df['population_density'].quantile(0.75),
-    'q90': df['population_density'].quantile(0.90)
+
+# Create gradient dictionary manually for HeatMap: 6 gradients
+gradient = {
+    0.0: 'blue',
+    0.2: 'cyan',
+    0.4: 'lime',
+    0.6: 'yellow',
+    0.8: 'orange',
+    1.0: 'red'
 }
 
+
+def build_viewport_layer(prepared, school_table, map_zoom, viewport, viewport_rendering, timer):
+    """
+    Heatmap and school layers for one view, as the feature group handed to st_folium.
+    Returns:
+        tuple: (FeatureGroup, dict with the number of school features, heat points and whether
+        schools are aggregated)
+    """
+    filtered_data = prepared['filtered_data']
+
+    # Layers that follow the view; st_folium swaps this group in place instead of redrawing the map
+    viewport_layer = folium.FeatureGroup(name='Viewport')
+
+    # Heat data from the aggregation pyramid: level picked for the current zoom, only the cells in
+    # the viewport, payload capped
+    timer.begin('Heatmap data')
+    heatmap_pyramid = prepared['heatmap_pyramid']
+    heat_level = heatmap_pyramid.level_for_view(map_zoom, viewport, radius_px=25, max_points=HEATMAP_MAX_POINTS)
+    heat_data = heatmap_pyramid.heat_data(heat_level, viewport)
+
+    # Add heat map layer: HEATmap uses heat_data to be created, then it is added to the viewport layer
+    HeatMap(heat_data,
+            min_opacity=0.3,
+            max_zoom=18,
+            radius=25,
+            blur=15,
+            gradient=gradient
+            ).add_to(viewport_layer)
+    timer.end()
+
+    # Add the schools in view as one GeoJSON layer, coloured client-side by classification status.
+    # Zoomed out, schools are sent as per-cell, per-status aggregates instead of individual markers
+    timer.begin('School features')
+    in_view = prepared['school_index'].query(viewport)
+    aggregate_schools = viewport_rendering and map_zoom < SCHOOL_DETAIL_ZOOM
+    if aggregate_schools:
+        school_aggregates = aggregate_points(
+            filtered_data['Lng'].to_numpy()[in_view],
+            filtered_data['Lat'].to_numpy()[in_view],
+            school_table['status'].to_numpy()[in_view],
+            cell_deg=SCHOOL_AGGREGATE_PX * degrees_per_pixel(map_zoom),
+        )
+        school_features = school_feature_collection(
+            school_aggregates, school_aggregates['class'], properties={'n': 'n'}, lat_col='lat', lng_col='lng')
+    else:
+        school_features = school_feature_collection(
+            filtered_data.iloc[in_view],
+            school_table['status'].to_numpy()[in_view],
+            # Tooltip attributes only; the details panel is built when a school is clicked
+            properties={
+                'id': 'EMIS_Code',
+                'name': 'School_Name',
+                'level': 'Level',
+                'enrollment': 'total_enrollment',
+            },
+        )
+    SchoolLayer(
+        school_features,
+        SCHOOL_STATUS_STYLE,
+        name_property='name',
+        enrollment_property='enrollment',
+        cluster=not aggregate_schools,
+    ).add_to(viewport_layer)
+    timer.end()
+
+    layer_info = {
+        'school_features': len(school_features['features']),
+        'aggregated': aggregate_schools,
+        'heat_points': len(heat_data),
+    }
+    return viewport_layer, layer_info
+
+
+# Timing spans for this rerun, shown in the diagnostics panel and appended to the timing log
+timer = RerunTimer()
+
+# Load data
+timer.begin('Map data')
+map_data_version = data_version(SCHOOLS_CSV, POPULATION_CSV, *([ROADS_FILE] if ROADS_FILE else []))
+prepared = prepare_map_data(map_data_version, _timer=timer)
+dataframe_pop = prepared['dataframe_pop']
+filtered_data = prepared['filtered_data']
+density_raster = prepared['density_raster']
+df = prepared['df']
+stats = prepared['stats']
+timer.end()
+
+# What-if thresholds: reclassifying is two binary searches over the precomputed distances
+isolation_radius_km = st.sidebar.slider("Isolation radius (km)", 1.0, 15.0, 5.0, 0.5)
+enrollment_threshold = st.sidebar.slider("Enrollment threshold", 0, 1000, 200, 10)
+distance_mode = st.sidebar.radio("Distance to high school", ["Straight line", "Road network"],
+                                 disabled=prepared['road_classifier'] is None,
+                                 help="Road network needs a local OSM extract in ROADS_FILE")
+use_roads = distance_mode == "Road network" and prepared['road_classifier'] is not None
+classifier = prepared['road_classifier'] if use_roads else prepared['classifier']
+with timer.span('Classification'):
+    school_table = classifier.classify(isolation_radius_km, enrollment_threshold)
+    school_table['catchment_population'] = prepared['catchment_population']
+    school_counts = status_counts(school_table)
+
+# View reported by the map component (key 'school_map') before this rerun. Only the layers in
+# viewport_layer depend on it; the base map stays identical, so the browser keeps it mounted
+view_state = st.session_state.get('school_map') or {}
+map_zoom = view_state.get('zoom') or 10
+viewport_rendering = st.sidebar.toggle("Render visible area only", value=True)
+viewport = bounds_to_bbox(view_state.get('bounds'), margin=VIEWPORT_MARGIN) if viewport_rendering else None
+
+# View-dependent layers are rebuilt only when the view or the data changes. They are kept per
+# session rather than in st.cache_resource because st_folium re-parents and renames the group
+view_key = (map_data_version, isolation_radius_km, enrollment_threshold, use_roads, map_zoom, viewport,
+            viewport_rendering)
+layer_cache_hit = st.session_state.get('viewport_layer_key') == view_key
+with timer.span('Viewport layers' + (' (cached)' if layer_cache_hit else '')):
+    if not layer_cache_hit:
+        st.session_state.viewport_layer = build_viewport_layer(
+            prepared, school_table, map_zoom, viewport, viewport_rendering, timer)
+        st.session_state.viewport_layer_key = view_key
+    viewport_layer, layer_info = st.session_state.viewport_layer
+
+# The base map holds only static HTML and is cheap to rebuild; a shared copy cannot be cached
+# because st_folium attaches the viewport layer to the map object it is given
+timer.begin('Base map')
 # Create base map with better initial view, using Folium with some starting position
 m = folium.Map(
-    location=[df['latitude'].mean(), df['longitude'].mean()],
+    location=prepared['center'],
     zoom_start=10,
     tiles='CartoDB positron',
     control_scale=True,
     prefer_canvas=True
 )
 
-# Prepare heat data: [lat, lng, weight]
-heat_data = [[row['latitude'], row['longitude'], row['population_density']]
-             for index, row in df.iterrows()]
 # Create colormap
 from branca.colormap import LinearColormap
 
@@ -194,27 +310,6 @@ colormap = LinearColormap(
     caption='Population Density (people/km²)'
 )
 
-# Create gradient dictionary manually for HeatMap: 6 gradients
-gradient = {
-    0.0: 'blue',
-    0.2: 'cyan',
-    0.4: 'lime',
-    0.6: 'yellow',
-    0.8: 'orange',
-    1.0: 'red'
-}
-
-# Add heat map layer: HEATmap uses heat_data to be created, then it is added to folium map m
-from folium.plugins import HeatMap
-
-HeatMap(heat_data,
-        min_opacity=0.3,
-        max_zoom=18,
-        radius=25,
-        blur=15,
-        gradient=gradient
-        ).add_to(m)
-
 # Add colormap to map
 colormap.add_to(m)
 
@@ -322,119 +417,14 @@ title_html = '''
 '''
 m.get_root().html.add_child(folium.Element(title_html))
 
-# --- PREPARE HIGH SCHOOLS LIST FOR PROXIMITY CHECK ---
-high_schools_list = []
-isolated_high_enrollment_count = 0
-isolated_low_enrollment_count = 0
-non_isolated_count = 0
-
-# First pass: collect all high schools
-for index, row in filtered_data.iterrows():
-    #HIGH Schools added to a list with coordinates, names
-    if row['Level'] == "High":
-        high_schools_list.append({
-            'lat': row['Lat'],
-            'lng': row['Lng'],
-            'name': row['School_Name']
-        })
-
+# --- CLASSIFY SCHOOLS ---
+# Classification comes from the threshold sliders above
 # Count schools by level for statistics
-high_school_count = len(filtered_data[filtered_data['Level'] == "High"])
+high_school_count = int(school_counts['High'])
 middle_school_count = len(filtered_data[filtered_data['Level'] == "Middle"])
-
-# Add school circles with different colors based on level
-for index, row in filtered_data.iterrows():
-    radius = 1000
-    school_name = row['School_Name']
-    school_level = row['Level']
-    enrollment = row.get('total_enrollment')
-
-    # Use the new function to determine colors
-    fill_color, border_color = get_school_color(row, high_schools_list)
-
-    # Count different types of middle schools
-    if school_level == "Middle":
-        # Evaluate 5km within a given middle school for existence of a high school
-        has_nearby_high = has_nearby_high_school(row['Lat'], row['Lng'], high_schools_list, 5.0)
-        # Check for high enrollment
-        has_high_enrollment = pd.notna(enrollment) and enrollment > 200
-
-        if not has_nearby_high:
-            if has_high_enrollment:
-                upgrade_candidates.append((row['Lat'], row['Lng'], row['School_Name'], row['EMIS_Code'], row['total_enrollment']))
-                isolated_high_enrollment_count += 1
-
-            else:
-                lowenrol.append((row['Lat'], row['Lng'], row['School_Name'], row['EMIS_Code'], row['total_enrollment']))
-                isolated_low_enrollment_count += 1
-        else:
-            non_isolated_count += 1
-        # Get isolated, non isolated counts
-
-    # Create a detailed popup with all requested information including enrollment
-    enrollment_text = f"{enrollment if pd.notna(enrollment) else 'N/A'}"
-    enrollment_color = "green" if pd.notna(enrollment) and enrollment > 200 else "inherit"
-
-    popup_text = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 300px;">
-        <h3 style="margin: 0 0 10px 0; color: #0078D7;">
-            {school_name}
-        </h3>
-        <table style="width: 100%; border-collapse: collapse;">
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold; width: 30%;">School ID:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['EMIS_Code']}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Level:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{school_level}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Enrollment:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold; color: {enrollment_color};">
-                    {enrollment_text}
-                </td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Type:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['Gender']}</极td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Latitude:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['Lat']:.6f}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Longitude:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['Lng']:.6f}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Radius:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{radius} meters</td>
-            </tr>
-            {"<tr><td style='padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;'>Status:</td><td style='padding: 5px; border-bottom: 1px solid #eee; color: goldenrod; font-weight: bold;'>ISOLATED - High Enrollment (>200)</td></tr>" if school_level == "Middle" and fill_color == "goldenrod" else ""}
-            {"<tr><td style='padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;'>Status:</td><td style='padding: 5px; border-bottom: 1px solid #eee; color: orange; font-weight: bold;'>ISOLATED - Low Enrollment (≤200)</td></tr>" if school_level == "Middle" and fill_color == "orange" else ""}
-        </table>
-    </div>
-    """
-
-    # Create tooltip with enrollment information
-    tooltip_text = f"{school_level} School: {school_name}"
-    if pd.notna(enrollment):
-        tooltip_text += f" (Enrollment: {enrollment})"
-
-    # Plot circles of every school
-    folium.Circle(
-        location=[row['Lat'], row['Lng']],
-        radius=100,
-        color=border_color,
-        weight=2,
-        fill_opacity=0.7,
-        opacity=1,
-        fill_color=fill_color,
-        fill=True,
-        popup=popup_text,
-        tooltip=tooltip_text,
-    ).add_to(m)
+non_isolated_count = int(school_counts['Near High'])
+isolated_high_enrollment_count = int(school_counts['Isolated - High Enrollment'])
+isolated_low_enrollment_count = int(school_counts['Isolated - Low Enrollment'])
 
 # Update legend to include all school types
 legend_html = f'''
@@ -504,6 +494,7 @@ legend_html = f'''
 '''
 
 m.get_root().html.add_child(folium.Element(legend_html))
+timer.end()
 
 # Create main layout with larger map
 st.title("🌍 Punjab Region - Middle to High School Upgrade")
@@ -529,16 +520,22 @@ col_map, col_info = st.columns([3, 1])
 
 with col_map:
     # Display the map with increased size
-    map_data = st_folium(
-        m,
-        width=1200,
-        height=800,
-        returned_objects=["last_clicked", "bounds", "zoom"]
-    )
+    with timer.span('st_folium serialization'):
+        map_data = st_folium(
+            m,
+            key='school_map',
+            feature_group_to_add=viewport_layer,
+            width=1200,
+            height=800,
+            returned_objects=["last_clicked", "last_object_clicked", "bounds", "zoom"]
+        )
+    st.caption(f"Rendering {layer_info['school_features']:,} school "
+               f"{'aggregates' if layer_info['aggregated'] else 'markers'} and {layer_info['heat_points']:,} "
+               f"heatmap points (zoom {map_zoom})")
 
 with col_info:
     st.header("Quick Info")
-    st.info("""
+    st.info(f"""
     **Map Controls:**
     - 🖱️ Scroll to zoom
     - 🖱️ Drag to pan
@@ -548,8 +545,8 @@ with col_info:
     **School Colors:**
     -  Green: High Schools
     -  Yellow: Middle Schools with High Schools nearby
-    -  Red: Isolated Middle Schools with Enrollment > 200
-    -  Blue: Isolated Middle Schools with Enrollment ≤ 200
+    -  Red: Isolated Middle Schools with Enrollment > {enrollment_threshold}
+    -  Blue: Isolated Middle Schools with Enrollment ≤ {enrollment_threshold}
     """)
 
     if map_data and map_data.get("last_clicked"):
@@ -557,6 +554,36 @@ with col_info:
         lng = map_data["last_clicked"]["lng"]
         st.success(f"**Last Click:** {lat:.6f}, {lng:.6f}")
 
+    # School details, looked up from the clicked marker position instead of embedded popups
+    if map_data and map_data.get("last_object_clicked"):
+        clicked = map_data["last_object_clicked"]
+        click_zoom = map_data.get("zoom") or map_zoom
+        school_pos = prepared['school_index'].nearest(
+            clicked["lng"], clicked["lat"], SCHOOL_CLICK_PX * degrees_per_pixel(click_zoom))
+        if layer_info['aggregated']:
+            st.caption("Zoom in to select individual schools")
+        elif school_pos is not None:
+            school = filtered_data.iloc[school_pos]
+            school_status = school_table.iloc[school_pos]
+            st.subheader(school['School_Name'])
+            st.table(pd.DataFrame({
+                'Field': ['School ID', 'Level', 'Enrollment', 'Type', 'Status',
+                          f"Nearest High School ({'road' if use_roads else 'straight line'})",
+                          f'Population within {CATCHMENT_RADIUS_KM:g} km',
+                          'Latitude', 'Longitude'],
+                'Value': [
+                    str(school['EMIS_Code']),
+                    str(school['Level']),
+                    'N/A' if pd.isna(school['total_enrollment']) else f"{school['total_enrollment']:,.0f}",
+                    str(school['Gender']),
+                    school_status['status'],
+                    f"{school_status['nearest_high_km']:.2f} km",
+                    f"{school_status['catchment_population']:,.0f}",
+                    f"{school['Lat']:.6f}",
+                    f"{school['Lng']:.6f}",
+                ],
+            }).set_index('Field'))
+
 # Initialize session state for clicked coordinates history
 if 'click_history' not in st.session_state:
     st.session_state.click_history = []
@@ -578,7 +605,8 @@ st.markdown("---")
 st.header("📍 Map Interaction Tools")
 
 # Create tabs for different functionalities
-tab1, tab2, tab3 = st.tabs(["📏 Distance Calculator", "📍 Clicked Coordinates", "📊 Data Statistics"])
+tab1, tab2, tab3, tab4 = st.tabs(["📏 Distance Calculator", "📍 Clicked Coordinates", "📊 Data Statistics",
+                                  "🏗️ Upgrade Planner"])
 
 with tab1:
     st.subheader("Distance Calculator")
@@ -597,24 +625,10 @@ with tab1:
         point2_lon = st.number_input("Longitude", value=74.3436, format="%.6f", key="point2_lon")
 
 
-    # Calculate distance function for the clicked coordinates on the map
-    def calculate_distance(lat1, lon1, lat2, lon2):
-        # Haversine formula
-        R = 6371  # Earth radius in kilometers
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-             math.sin(dlon / 2) * math.sin(dlon / 2))
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
-        return distance
-
-
     # Calculate and display results
     if st.button("Calculate Distance", type="primary", key="calc_dist"):
         try:
-            distance_km = calculate_distance(point1_lat, point1_lon, point2_lat, point2_lon)
+            distance_km = float(haversine_km(point1_lat, point1_lon, point2_lat, point2_lon))
             st.success(f"**Distance between points:** {distance_km:.2f} km")
 
             # Additional information
@@ -712,9 +726,76 @@ with tab3:
     with col_sch4:
         st.metric("Isolated Low Enrollment", isolated_low_enrollment_count)
 
+    st.write("**Population Coverage:**")
+    coverage = prepared['coverage_curve']
+    col_cov1, col_cov2, col_cov3 = st.columns(3)
+    with col_cov1:
+        st.metric("Population within 2 km of a High School",
+                  f"{np.interp(2.0, coverage['distance_km'], coverage['share_within']):.1%}")
+    with col_cov2:
+        st.metric("Population within 5 km of a High School",
+                  f"{np.interp(5.0, coverage['distance_km'], coverage['share_within']):.1%}")
+    with col_cov3:
+        st.metric(f"Population within {isolation_radius_km:g} km of a High School",
+                  f"{np.interp(isolation_radius_km, coverage['distance_km'], coverage['share_within']):.1%}")
+    st.line_chart(coverage.set_index('distance_km')['share_within'], x_label="Distance to nearest high school (km)",
+                  y_label="Share of population")
+    st.caption("Straight-line distance from every 1 km cell in file3.csv to its nearest high school. The file "
+               "only holds cells with density above 1000 people/km², so shares are of the population living "
+               "in those cells, not of all of Punjab")
+
+    col_dl1, col_dl2 = st.columns(2)
+    with col_dl1:
+        st.download_button("⬇️ Coverage curve (CSV)", coverage_csv(map_data_version, 'coverage_curve'),
+                           file_name="population_coverage_curve.csv", mime="text/csv")
+    with col_dl2:
+        st.download_button("⬇️ Cell distances (CSV)", coverage_csv(map_data_version, 'coverage_cells'),
+                           file_name="population_cell_distances.csv", mime="text/csv")
+
+with tab4:
+    st.subheader("Upgrade Planner")
+    st.caption(f"Middle schools to upgrade so the most isolated schools end up within {isolation_radius_km:g} km "
+               "of a high school. Each upgrade covers every isolated school in its radius, so later picks "
+               "only count what is still uncovered.")
+
+    col_plan1, col_plan2, col_plan3 = st.columns(3)
+    with col_plan1:
+        upgrade_count = st.number_input("Upgrades", min_value=1, max_value=500, value=10, step=1, key="upgrade_count")
+    with col_plan2:
+        objective = st.selectbox("Maximize", ["Isolated enrollment", "Catchment population"], key="upgrade_objective")
+    with col_plan3:
+        candidate_pool = st.selectbox("Candidates", ["Isolated middle schools", "All middle schools"],
+                                      key="upgrade_candidates")
+
+    with timer.span('Upgrade plan'):
+        upgrade_plan = plan_upgrades(
+            filtered_data, school_table, k=int(upgrade_count),
+            weights='total_enrollment' if objective == "Isolated enrollment" else 'catchment_population',
+            radius_km=isolation_radius_km,
+            candidates='isolated' if candidate_pool == "Isolated middle schools" else 'middle')
+
+    if upgrade_plan.empty:
+        st.info("No upgrade adds coverage: every middle school is already near a high school")
+    else:
+        col_gain1, col_gain2, col_gain3 = st.columns(3)
+        with col_gain1:
+            st.metric("Planned Upgrades", len(upgrade_plan))
+        with col_gain2:
+            st.metric(f"{objective} Covered", f"{upgrade_plan['cumulative_gain'].iloc[-1]:,.0f}")
+        with col_gain3:
+            st.metric("Share of Isolated Total", f"{upgrade_plan['cumulative_share'].iloc[-1]:.1%}")
+
+        plan_table = filtered_data.loc[upgrade_plan.index, ['School_Name', 'EMIS_Code', 'Lat', 'Lng',
+                                                            'total_enrollment']].join(upgrade_plan)
+        st.dataframe(plan_table.rename(columns={
+            'rank': 'Rank', 'gain': 'Coverage Gained', 'schools_covered': 'Isolated Schools Covered',
+            'cumulative_gain': 'Cumulative Coverage', 'cumulative_share': 'Cumulative Share',
+        }).set_index('Rank'))
+        st.line_chart(upgrade_plan.set_index('rank')['cumulative_share'])
+
 # Instructions section
 with st.expander("ℹ️ How to use this application"):
-    st.markdown("""
+    st.markdown(f"""
     ### 🗺️ Map Interaction Guide
 
     **Clicking on the Map:**
@@ -730,8 +811,8 @@ with st.expander("ℹ️ How to use this application"):
     - **Heat Map**: Population density visualization
     - ** Green Circles**: High Schools (Male)
     - ** Yellow Circles**: Middle Schools with High Schools nearby
-    - ** Red Circles**: Isolated Middle Schools with Enrollment > 200
-    - ** Blue Circles**: Isolated Middle Schools with Enrollment ≤ 200
+    - ** Red Circles**: Isolated Middle Schools with Enrollment > {enrollment_threshold}
+    - ** Blue Circles**: Isolated Middle Schools with Enrollment ≤ {enrollment_threshold}
     - **Statistics Panel**: Top-right shows data metrics
     - **Legend**: Bottom-right explains map symbols
 
@@ -740,7 +821,8 @@ with st.expander("ℹ️ How to use this application"):
     - School data includes both High and Middle Schools (Male)
     - All coordinates in decimal degrees format
     - Enrollment data displayed in school popups
-    - Isolated Middle Schools are those with no High Schools within 5km radius
+    - Isolated Middle Schools are those with no High Schools within {isolation_radius_km:g}km radius
+    - With a road extract in ROADS_FILE, "Road network" measures that radius as travel distance along roads
     """)
 
 # Save the map option
@@ -754,11 +836,36 @@ if st.button("💾 Save Map as HTML File"):
 st.markdown("---")
 st.caption("🌍 Built with Streamlit, Folium, and Python | Population Density Analysis Tool")
 
-# Convert directly to DataFrame
-dfx = pd.DataFrame(upgrade_candidates, columns=['Latitude', 'Longitude', 'School_Name', 'EMIS_code', 'total_enrollment'])
-dflow = pd.DataFrame(lowenrol, columns=['Latitude', 'Longitude', 'School_Name', 'EMIS_code', 'total_enrollment'])
+# Candidate lists read straight from the classification table, ranked by catchment population
+candidate_columns = {'Lat': 'Latitude', 'Lng': 'Longitude', 'School_Name': 'School_Name',
+                     'EMIS_Code': 'EMIS_code', 'total_enrollment': 'total_enrollment',
+                     'catchment_population': 'catchment_population'}
+candidate_data = filtered_data.assign(catchment_population=school_table['catchment_population'].round())
+upgrade_candidates = candidate_data.loc[school_table['status'] == 'Isolated - High Enrollment', list(candidate_columns)]
+lowenrol = candidate_data.loc[school_table['status'] == 'Isolated - Low Enrollment', list(candidate_columns)]
+dfx = (upgrade_candidates.rename(columns=candidate_columns)
+       .sort_values('catchment_population', ascending=False).reset_index(drop=True))
+dflow = (lowenrol.rename(columns=candidate_columns)
+         .sort_values('catchment_population', ascending=False).reset_index(drop=True))
 st.dataframe(dfx)
 st.dataframe(dflow)
+
+# Diagnostics: per-stage timing of this rerun (and a cProfile capture with SCHOOLMAP_PROFILE=1),
+# also appended to the JSON-lines timing log
+timer.finish()
+with st.sidebar.expander("🩺 Diagnostics"):
+    st.metric("Rerun time", f"{timer.total * 1000:,.1f} ms")
+    st.dataframe(pd.DataFrame({
+        'Stage': ['\u2003' * span['depth'] + span['name'] for span in timer.spans],
+        'ms': [round(span['seconds'] * 1000, 1) for span in timer.spans],
+    }), hide_index=True)
+    profile_text = timer.profile_text()
+    if profile_text:
+        st.code(profile_text, language="text")
+    else:
+        st.caption("Set SCHOOLMAP_PROFILE=1 to capture a cProfile of every rerun")
+append_jsonl(timer.record(app='PunjabSclLoc', zoom=map_zoom, viewport=viewport,
+                          viewport_layers_cached=layer_cache_hit))
 # Save to CSV
 #dfx.to_csv('/Users/muhammadwisalabdullah/Downloads/schools_data.csv', index=False)
 #print("CSV file saved successfully!")
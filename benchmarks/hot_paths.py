@@ -0,0 +1,239 @@
+"""
+Wall time, peak memory and throughput of the app's hot paths on synthetic inputs, as JSON.
+Covers the proximity check (scalar reference and index), school classification, Punjab
+clipping (polygon index and raster mask), heatmap preparation and map HTML generation.
+
+    python benchmarks/hot_paths.py [--sizes 1000 10000 100000 1000000] [--cases ...] [--output results.json]
+    python benchmarks/hot_paths.py --compare baseline.json [--threshold 1.25]
+
+With --compare, cases more than threshold times slower than in the baseline file are listed
+and the exit status is 1.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import folium
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from classification import SCHOOL_STATUS_STYLE, classify_schools  # noqa: E402
+from grid_mask import GridTransform, cell_indices, rasterize_region  # noqa: E402
+from heatmap_pyramid import HeatmapPyramid  # noqa: E402
+from point_in_polygon import PolygonIndex  # noqa: E402
+from proximity import HighSchoolIndex, has_nearby_high_school  # noqa: E402
+from school_layer import SchoolLayer, school_feature_collection  # noqa: E402
+from school_layer_benchmark import synthetic_schools  # noqa: E402
+
+PUNJAB_BBOX = (69.3, 27.7, 75.4, 34.0)  # min_lon, min_lat, max_lon, max_lat
+CELL_DEG = 0.0083333  # WorldPop 1 km grid step
+
+
+def synthetic_region(n_vertices=4000, seed=0):
+    """Star-shaped polygon over the Punjab bounding box, with a jagged boundary like a real border."""
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = PUNJAB_BBOX
+    angle = np.linspace(0, 2 * np.pi, n_vertices, endpoint=False)
+    radius = 0.8 + 0.2 * rng.random(n_vertices)
+    lons = (min_lon + max_lon) / 2 + (max_lon - min_lon) / 2 * radius * np.cos(angle)
+    lats = (min_lat + max_lat) / 2 + (max_lat - min_lat) / 2 * radius * np.sin(angle)
+    ring = np.column_stack((lons, lats)).tolist()
+    return {'type': 'Polygon', 'coordinates': [ring + ring[:1]]}
+
+
+def synthetic_grid(n_cells, seed=0):
+    """Square population grid of about n_cells cells over Punjab, with 20% nodata."""
+    rng = np.random.default_rng(seed)
+    side = max(int(np.sqrt(n_cells)), 2)
+    values = rng.lognormal(6, 1.5, (side, side)).astype(np.float32)
+    values[rng.random((side, side)) < 0.2] = np.nan
+    transform = GridTransform(PUNJAB_BBOX[0], PUNJAB_BBOX[1], CELL_DEG, CELL_DEG, side, side)
+    return values, transform
+
+
+def synthetic_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    min_lon, min_lat, max_lon, max_lat = PUNJAB_BBOX
+    return rng.uniform(min_lon, max_lon, n), rng.uniform(min_lat, max_lat, n)
+
+
+# Every case takes a size and returns (function to time, items it processes); setup is not timed
+
+def case_proximity_scalar(n):
+    schools = synthetic_schools(n)
+    high = schools[schools['Level'] == "High"]
+    middle = schools[schools['Level'] == "Middle"]
+    high_list = [{'lat': lat, 'lng': lng} for lat, lng in zip(high['Lat'], high['Lng'])]
+    points = list(zip(middle['Lat'], middle['Lng']))
+    return lambda: [has_nearby_high_school(lat, lng, high_list, 5.0) for lat, lng in points], len(points)
+
+
+def case_proximity_index(n):
+    schools = synthetic_schools(n)
+    high = schools[schools['Level'] == "High"]
+    middle = schools[schools['Level'] == "Middle"]
+    lats, lngs = middle['Lat'].to_numpy(), middle['Lng'].to_numpy()
+
+    def run():
+        HighSchoolIndex(high['Lat'].to_numpy(), high['Lng'].to_numpy()).any_within(lats, lngs, 5.0)
+    return run, len(middle)
+
+
+def case_classification(n):
+    schools = synthetic_schools(n)
+    return lambda: classify_schools(schools), n
+
+
+def case_clip_polygon(n):
+    region = synthetic_region()
+    lons, lats = synthetic_points(n)
+    return lambda: PolygonIndex(region).contains(lons, lats), n
+
+
+def case_clip_raster(n):
+    region = synthetic_region()
+    values, transform = synthetic_grid(n)
+    rows, cols = np.nonzero(~np.isnan(values))
+    lons = transform.origin_lon + cols * transform.cell_lon
+    lats = transform.origin_lat + rows * transform.cell_lat
+
+    def run():
+        mask = rasterize_region(region, transform)
+        point_rows, point_cols, valid = cell_indices(transform, lons, lats)
+        return valid & mask[np.where(valid, point_rows, 0), np.where(valid, point_cols, 0)]
+    return run, len(lons)
+
+
+def case_heatmap(n):
+    values, transform = synthetic_grid(n)
+
+    def run():
+        pyramid = HeatmapPyramid(values, transform)
+        return pyramid.heat_data(pyramid.level_for_zoom(10, max_points=20_000))
+    return run, values.size
+
+
+def case_map_html(n):
+    schools = synthetic_schools(n)
+    table = classify_schools(schools)
+
+    def run():
+        m = folium.Map(location=[31.0, 72.5], zoom_start=7, prefer_canvas=True)
+        features = school_feature_collection(
+            schools, table['status'], properties={'id': 'EMIS_Code', 'name': 'School_Name', 'level': 'Level',
+                                                  'enrollment': 'total_enrollment'})
+        SchoolLayer(features, SCHOOL_STATUS_STYLE, name_property='name',
+                    enrollment_property='enrollment').add_to(m)
+        return m.get_root().render()
+    return run, n
+
+
+# Case name -> (setup function, largest size it is run at)
+CASES = {
+    'proximity_scalar': (case_proximity_scalar, 10_000),
+    'proximity_index': (case_proximity_index, None),
+    'classification': (case_classification, None),
+    'clip_polygon': (case_clip_polygon, None),
+    'clip_raster': (case_clip_raster, None),
+    'heatmap': (case_heatmap, None),
+    'map_html': (case_map_html, 100_000),
+}
+
+
+def measure(run, items, repeat):
+    """Best wall time of repeat runs, then one run under tracemalloc for the peak allocation."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    seconds = min(times)
+    return {
+        'seconds': seconds,
+        'peak_mb': peak / 1e6,
+        'items': items,
+        'items_per_sec': items / seconds if seconds > 0 else None,
+    }
+
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'folium': folium.__version__,
+        'machine': platform.machine(),
+        'platform': platform.platform(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """Cases slower than threshold times the baseline, as (case, size, ratio)."""
+    with open(baseline_path) as f:
+        baseline = {(r['case'], r['size']): r for r in json.load(f)['results']}
+    regressions = []
+    for result in results:
+        old = baseline.get((result['case'], result['size']))
+        if old and old['seconds'] > 0:
+            ratio = result['seconds'] / old['seconds']
+            result['baseline_ratio'] = ratio
+            if ratio > threshold:
+                regressions.append((result['case'], result['size'], ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument('--cases', nargs='+', choices=list(CASES), default=list(CASES))
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case, the best one is reported")
+    parser.add_argument('--output', help="Write the JSON report here instead of stdout")
+    parser.add_argument('--compare', help="Baseline JSON report to check for regressions")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="Slowdown factor against the baseline counted as a regression")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.cases:
+        setup, max_size = CASES[name]
+        for n in args.sizes:
+            if max_size is not None and n > max_size:
+                continue
+            run, items = setup(n)
+            result = {'case': name, 'size': n, **measure(run, items, args.repeat)}
+            results.append(result)
+            print(f"{name:<18} {n:>9,}  {result['seconds']:>9.4f} s  {result['peak_mb']:>8.1f} MB",
+                  file=sys.stderr)
+
+    regressions = compare(results, args.compare, args.threshold) if args.compare else []
+    report = json.dumps({'environment': environment(), 'results': results}, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report + '\n')
+    else:
+        print(report)
+
+    for name, n, ratio in regressions:
+        print(f"REGRESSION {name} at {n:,}: {ratio:.2f}x slower than baseline", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Generated HTML size and build time of the school layer for 1k, 10k and 100k schools.
+Compares the old one-folium.Circle-per-school rendering with the single GeoJSON SchoolLayer.
+
+    python benchmarks/school_layer_benchmark.py [--sizes 1000 10000 100000] [--skip-circles-above 10000]
+"""
+import argparse
+import os
+import sys
+import time
+import folium
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from classification import SCHOOL_STATUS_STYLE, classify_schools  # noqa: E402
+from school_layer import SchoolLayer, school_feature_collection  # noqa: E402
+
+
+def synthetic_schools(n, seed=0):
+    """Random High/Middle schools spread over Punjab's bounding box."""
+    rng = np.random.default_rng(seed)
+    enrollment = rng.integers(20, 900, n).astype(float)
+    enrollment[rng.random(n) < 0.05] = np.nan
+    return pd.DataFrame({
+        'EMIS_Code': np.arange(35_000_000, 35_000_000 + n),
+        'School_Name': [f"GOVT MIDDLE SCHOOL CHAK NO {i}" for i in range(n)],
+        'Level': rng.choice(["High", "Middle"], n, p=[0.35, 0.65]),
+        'Gender': "Male",
+        'Lat': rng.uniform(28.0, 34.0, n),
+        'Lng': rng.uniform(69.5, 75.5, n),
+        'total_enrollment': enrollment,
+    })
+
+
+def build_circles(schools, table):
+    """Old rendering: one folium.Circle with inline popup HTML per school."""
+    m = folium.Map(location=[31.0, 72.5], zoom_start=7, prefer_canvas=True)
+    for index, row in schools.iterrows():
+        enrollment = row['total_enrollment']
+        popup_text = f"""
+        <div style="font-family: Arial, sans-serif; max-width: 300px;">
+            <h3 style="margin: 0 0 10px 0; color: #0078D7;">{row['School_Name']}</h3>
+            <table style="width: 100%; border-collapse: collapse;">
+                <tr><td>School ID:</td><td>{row['EMIS_Code']}</td></tr>
+                <tr><td>Level:</td><td>{row['Level']}</td></tr>
+                <tr><td>Enrollment:</td><td>{enrollment if pd.notna(enrollment) else 'N/A'}</td></tr>
+                <tr><td>Type:</td><td>{row['Gender']}</td></tr>
+                <tr><td>Latitude:</td><td>{row['Lat']:.6f}</td></tr>
+                <tr><td>Longitude:</td><td>{row['Lng']:.6f}</td></tr>
+            </table>
+        </div>
+        """
+        folium.Circle(
+            location=[row['Lat'], row['Lng']],
+            radius=100,
+            color=table.at[index, 'border_color'],
+            weight=2,
+            fill_opacity=0.7,
+            opacity=1,
+            fill_color=table.at[index, 'fill_color'],
+            fill=True,
+            popup=popup_text,
+            tooltip=f"{row['Level']} School: {row['School_Name']}",
+        ).add_to(m)
+    return m.get_root().render()
+
+
+def build_school_layer(schools, table):
+    """New rendering: all schools in one clustered GeoJSON layer."""
+    m = folium.Map(location=[31.0, 72.5], zoom_start=7, prefer_canvas=True)
+    features = school_feature_collection(
+        schools, table['status'],
+        properties={'id': 'EMIS_Code', 'name': 'School_Name', 'level': 'Level',
+                    'enrollment': 'total_enrollment', 'gender': 'Gender'},
+    )
+    SchoolLayer(
+        features, SCHOOL_STATUS_STYLE,
+        popup_fields=[('School ID', 'id'), ('Level', 'level'), ('Enrollment', 'enrollment'),
+                      ('Type', 'gender'), ('Status', 'c')],
+        enrollment_property='enrollment',
+    ).add_to(m)
+    return m.get_root().render()
+
+
+def measure(build, schools, table):
+    start = time.perf_counter()
+    html = build(schools, table)
+    return time.perf_counter() - start, len(html.encode('utf-8'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--skip-circles-above', type=int, default=None,
+                        help="Skip the slow per-circle rendering above this many schools")
+    args = parser.parse_args()
+
+    print(f"{'schools':>8}  {'renderer':<12} {'build s':>9} {'HTML MB':>9}")
+    for n in args.sizes:
+        schools = synthetic_schools(n)
+        table = classify_schools(schools)
+        renderers = [('geojson', build_school_layer)]
+        if args.skip_circles_above is None or n <= args.skip_circles_above:
+            renderers.insert(0, ('circles', build_circles))
+        for name, build in renderers:
+            seconds, size = measure(build, schools, table)
+            print(f"{n:>8}  {name:<12} {seconds:>9.2f} {size / 1e6:>9.2f}")
+
+
+if __name__ == '__main__':
+    main()
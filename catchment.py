@@ -0,0 +1,94 @@
+import math
+import numpy as np
+from proximity import KM_PER_DEGREE
+
+
+def summed_area_table(values):
+    """
+    Integral image of a 2D density array, NaN counted as 0.
+    table[r, c] is the sum of values[:r, :c], so the table has one extra leading row and column.
+    """
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+    table = np.zeros((values.shape[0] + 1, values.shape[1] + 1))
+    np.cumsum(values, axis=0, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def rectangle_sums(table, row0, col0, row1, col1):
+    """
+    Sums of values[row0:row1 + 1, col0:col1 + 1] for arrays of inclusive bounds, in O(1) each.
+    Bounds are clipped to the grid; empty rectangles sum to 0.
+    """
+    n_rows, n_cols = table.shape[0] - 1, table.shape[1] - 1
+    row0, col0 = np.clip(row0, 0, n_rows), np.clip(col0, 0, n_cols)
+    row1, col1 = np.clip(np.asarray(row1) + 1, 0, n_rows), np.clip(np.asarray(col1) + 1, 0, n_cols)
+    row1, col1 = np.maximum(row1, row0), np.maximum(col1, col0)
+    return table[row1, col1] - table[row0, col1] - table[row1, col0] + table[row0, col0]
+
+
+def _chord_integral(u):
+    # Integral of the unit circle's full chord 2 * sqrt(1 - u^2) from 0 to u
+    return u * np.sqrt(1 - u * u) + np.arcsin(u)
+
+
+def catchment_population(values, transform, lats, lons, radius_km=5.0, table=None):
+    """
+    Population within radius_km of each point, from a population density grid (people per km²).
+    The circle is cut into one horizontal strip per grid row, as wide as the circle's mean chord
+    over that row, so every strip has the exact area of its slice of the circle. Each strip is
+    a rectangle sum on the summed-area table, and the two cells cut by the strip ends are added
+    by the fraction of their width inside it. Cost per point is one O(1) sum per
+    grid row the circle spans, about 11 rows for 5 km on the 1 km grid.
+    Args:
+        values: 2D density array (NaN for nodata), e.g. DensityRaster.values
+        transform: GridTransform of values
+        lats, lons: Catchment centres
+        radius_km: Catchment radius
+        table: Precomputed summed_area_table(values), to reuse across calls
+    Returns:
+        ndarray: Population per point (0 where the circle misses the grid)
+    """
+    if table is None:
+        table = summed_area_table(values)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    n_rows, n_cols = table.shape[0] - 1, table.shape[1] - 1
+
+    cell_h_km = abs(transform.cell_lat) * KM_PER_DEGREE
+    cell_w_km = abs(transform.cell_lon) * KM_PER_DEGREE * np.cos(np.radians(lats))
+    row_f = (lats - transform.origin_lat) / transform.cell_lat  # Fractional row / column of the centre
+    col_f = (lons - transform.origin_lon) / transform.cell_lon
+    half_rows = radius_km / cell_h_km
+    half_cols = radius_km / cell_w_km
+
+    def cell_values(rows, cols, inside):
+        out = np.zeros(len(rows))
+        out[inside] = np.nan_to_num(values[rows[inside], cols[inside]], nan=0.0)
+        return out
+
+    total = np.zeros(len(lats))
+    base_row = np.rint(row_f).astype(np.int64)
+    reach = int(math.ceil(half_rows)) + 1
+    for offset in range(-reach, reach + 1):
+        rows = base_row + offset
+        # Vertical extent of the row in radii from the centre, clipped to the circle
+        low = np.clip((rows - 0.5 - row_f) / half_rows, -1, 1)
+        high = np.clip((rows + 0.5 - row_f) / half_rows, -1, 1)
+        in_circle = (high > low) & (rows >= 0) & (rows < n_rows)
+        if not in_circle.any():
+            continue
+        # Strip [left, right] in column units, cells centred on integers and one unit wide. Its
+        # half-width is the circle's mean half-chord over the row, so the strip area is exact
+        half_width = half_cols * (_chord_integral(high) - _chord_integral(low)) / 2 * half_rows
+        left, right = col_f - half_width, col_f + half_width
+        left_cell = np.floor(left + 0.5).astype(np.int64)
+        right_cell = np.floor(right + 0.5).astype(np.int64)
+        strip = rectangle_sums(table, rows, left_cell + 1, rows, right_cell - 1)
+        same = left_cell == right_cell
+        left_weight = np.where(same, right - left, left_cell + 0.5 - left)
+        right_weight = np.where(same, 0.0, right - (right_cell - 0.5))
+        strip += left_weight * cell_values(rows, left_cell, in_circle & (left_cell >= 0) & (left_cell < n_cols))
+        strip += right_weight * cell_values(rows, right_cell, in_circle & (right_cell >= 0) & (right_cell < n_cols))
+        total += np.where(in_circle, strip, 0.0)
+    return total * cell_h_km * cell_w_km
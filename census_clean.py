@@ -0,0 +1,118 @@
+import glob
+import os
+import numpy as np
+import pandas as pd
+from data_cache import atomic_path
+
+CLEAN_CACHE_DIR = os.path.join('.cache', 'census')
+HASH_COLUMN = 'row_hash'
+# Bump whenever clean_rows changes, so cached results of the old rules are not reused
+RULES_VERSION = 1
+
+UPGRADE_YEAR_COLUMNS = ['upgrade_primary_year', 'upgrade_middle_year', 'upgrade_high_year', 'upgrade_high_sec_year']
+
+
+def row_hashes(census):
+    """Deterministic 64-bit content hash of every row (same values give the same hash in every run)."""
+    return pd.util.hash_pandas_object(census, index=False).to_numpy(np.uint64)
+
+
+def moza_from_name(names):
+    """
+    Lowercased part of each school name after its second space, as Clean_2017.sql extracts it
+    with SUBSTRING/LOCATE; names with fewer than two spaces are used whole, like LOCATE
+    returning 0 in the SQL.
+    """
+    names = pd.Series(names, dtype='string')
+    parts = names.str.split(' ', n=2)
+    rest = parts.str.get(2)
+    return rest.where(parts.str.len() == 3, names).str.lower()
+
+
+def clean_rows(census):
+    """
+    The row-level rules of Clean_2017.sql, applied to a copy of census in a few vectorized passes.
+    - Primary schools get every upgrade year set to 0
+    - An empty moza is filled from the school name (moza_from_name); missing (NULL) stays missing
+    """
+    cleaned = census.copy()
+    primary = (cleaned['Level'] == 'Primary').fillna(False).to_numpy(dtype=bool)
+    for column in UPGRADE_YEAR_COLUMNS:
+        if column in cleaned.columns:
+            cleaned.loc[primary, column] = 0
+
+    empty_moza = (cleaned['moza'] == '').fillna(False).to_numpy(dtype=bool)
+    if empty_moza.any():
+        cleaned['moza'] = cleaned['moza'].astype('string')
+        cleaned.loc[empty_moza, 'moza'] = moza_from_name(cleaned.loc[empty_moza, 'School_Name']).to_numpy()
+    return cleaned
+
+
+def clean_census(census, previous=None):
+    """
+    Clean a census drop, reprocessing only the rows that are new since the previous run.
+    Rows are identified by the content hash of their raw values: a row whose hash was seen in
+    previous is taken from there as it is, every other row goes through clean_rows. Identical
+    raw rows share a hash and are cleaned once. Duplicates are then removed by EMIS_Code, the
+    school's key, keeping its first row (rows without a code are only deduplicated when
+    identical); this is the "Remove Duplicates" step Clean_2017.sql leaves empty. The output is
+    in the order of the first occurrence of each row in census, so it does not depend on previous.
+    Args:
+        census: Raw census DataFrame (census_db.load_census)
+        previous: Result of an earlier clean_census with the same RULES_VERSION, or None to
+            clean every row
+    Returns:
+        tuple: (cleaned DataFrame with a row_hash column of the raw row, dict with the number of
+        rows reused, cleaned, dropped as duplicates and gone since previous)
+    """
+    hashes = row_hashes(census)
+    unique = ~pd.Series(hashes).duplicated().to_numpy()
+    census, hashes = census.loc[unique].reset_index(drop=True), hashes[unique]
+
+    if previous is not None and len(previous):
+        previous_hashes = previous[HASH_COLUMN].to_numpy(np.uint64)
+        seen = np.isin(hashes, previous_hashes)
+    else:
+        previous_hashes = np.empty(0, dtype=np.uint64)
+        seen = np.zeros(len(hashes), dtype=bool)
+
+    fresh = clean_rows(census.loc[~seen])
+    fresh[HASH_COLUMN] = hashes[~seen]
+    parts = [fresh]
+    if seen.any():
+        position = pd.Series(np.arange(len(previous_hashes)), index=previous_hashes)
+        parts.append(previous.iloc[position.loc[hashes[seen]].to_numpy()].set_axis(np.flatnonzero(seen)))
+    # Back in the order of census; fresh keeps the census positions as its index
+    cleaned = pd.concat(parts).sort_index().reset_index(drop=True)
+    for column in census.columns:
+        if isinstance(census[column].dtype, pd.CategoricalDtype):
+            cleaned[column] = cleaned[column].astype('category')
+    repeated_code = cleaned['EMIS_Code'].duplicated() & cleaned['EMIS_Code'].notna()
+    cleaned = cleaned.loc[~repeated_code.to_numpy(dtype=bool)].reset_index(drop=True)
+
+    counts = {
+        'reused': int(seen.sum()),
+        'cleaned': int((~seen).sum()),
+        'duplicates': int((~unique).sum() + repeated_code.sum()),
+        'removed': int((~np.isin(previous_hashes, hashes)).sum()),
+    }
+    return cleaned, counts
+
+
+def clean_census_cached(census, name='census', cache_dir=CLEAN_CACHE_DIR):
+    """
+    clean_census against the result of the last run, kept as Parquet in cache_dir.
+    The file name carries RULES_VERSION; results of other rule versions are deleted unused.
+    Returns:
+        tuple: (cleaned DataFrame, counts dict of clean_census)
+    """
+    path = os.path.join(cache_dir, f"{name}-clean-v{RULES_VERSION}.parquet")
+    for stale_path in glob.glob(os.path.join(glob.escape(cache_dir), f"{glob.escape(name)}-clean*.parquet")):
+        if stale_path != path:
+            os.remove(stale_path)
+    previous = pd.read_parquet(path) if os.path.exists(path) else None
+    cleaned, counts = clean_census(census, previous)
+    os.makedirs(cache_dir, exist_ok=True)
+    with atomic_path(path) as tmp_path:
+        cleaned.to_parquet(tmp_path, index=False)
+    return cleaned, counts
@@ -0,0 +1,154 @@
+import numpy as np
+import pandas as pd
+from proximity import HighSchoolIndex
+
+# (fill_color, border_color) and legend label for every school status
+SCHOOL_STATUS_STYLE = {
+    'High': ("green", "darkgreen"),
+    'Near High': ("yellow", "yellow"),
+    'Isolated - High Enrollment': ("red", "red"),
+    'Isolated - Low Enrollment': ("blue", "blue"),
+    'Other': ("black", "black"),
+}
+
+_STATUS_LABELS = np.array(list(SCHOOL_STATUS_STYLE), dtype=object)
+_STATUS_FILLS = np.array([fill for fill, _ in SCHOOL_STATUS_STYLE.values()], dtype=object)
+_STATUS_BORDERS = np.array([border for _, border in SCHOOL_STATUS_STYLE.values()], dtype=object)
+
+
+def classify_schools(schools, radius_km=5.0, enrollment_threshold=200, high_school_index=None):
+    """
+    Classify every school in one vectorized pass.
+    Middle schools with no high school within radius_km are isolated; isolated schools with
+    enrollment above the threshold are upgrade candidates (the golden rule).
+    Args:
+        schools: DataFrame with 'Level', 'Lat', 'Lng' and 'total_enrollment' columns
+        radius_km: Proximity radius for the isolation check
+        enrollment_threshold: Enrollment above which an isolated school is high enrollment
+        high_school_index: Optional prebuilt HighSchoolIndex, built from the High rows otherwise
+    Returns:
+        DataFrame: Same index as schools with nearest_high_km, isolated, high_enrollment,
+        status, fill_color and border_color columns
+    """
+    level = schools['Level']
+    is_high = (level == "High").to_numpy()
+    is_middle = (level == "Middle").to_numpy()
+    lats = schools['Lat'].to_numpy(dtype=np.float64)
+    lngs = schools['Lng'].to_numpy(dtype=np.float64)
+
+    if high_school_index is None:
+        high_school_index = HighSchoolIndex(lats[is_high], lngs[is_high])
+
+    nearest_high_km = np.full(len(schools), np.nan)
+    nearest_high_km[is_middle] = high_school_index.nearest_distance(lats[is_middle], lngs[is_middle])
+
+    isolated = np.zeros(len(schools), dtype=bool)
+    isolated[is_middle] = ~high_school_index.any_within(lats[is_middle], lngs[is_middle], radius_km)
+
+    # Missing enrollment never counts as high enrollment
+    enrollment = pd.to_numeric(schools['total_enrollment'], errors='coerce').to_numpy(dtype=np.float64)
+    high_enrollment = np.nan_to_num(enrollment, nan=-np.inf) > enrollment_threshold
+
+    status = np.select(
+        [is_high, is_middle & ~isolated, isolated & high_enrollment, isolated],
+        ['High', 'Near High', 'Isolated - High Enrollment', 'Isolated - Low Enrollment'],
+        default='Other'
+    )
+    table = pd.DataFrame({
+        'nearest_high_km': nearest_high_km,
+        'isolated': isolated,
+        'high_enrollment': high_enrollment,
+        'status': status,
+    }, index=schools.index)
+    table['fill_color'] = table['status'].map({k: v[0] for k, v in SCHOOL_STATUS_STYLE.items()})
+    table['border_color'] = table['status'].map({k: v[1] for k, v in SCHOOL_STATUS_STYLE.items()})
+    return table
+
+
+def status_counts(table):
+    """Number of schools per status, with zero for statuses that do not occur."""
+    return table['status'].value_counts().reindex(list(SCHOOL_STATUS_STYLE), fill_value=0)
+
+
+class ThresholdClassifier:
+    """
+    Classification for any radius and enrollment threshold without recomputing distances.
+    The radius at which each middle school stops being isolated (HighSchoolIndex.admitting_radius,
+    the same bounding box and haversine rule as has_nearby_high_school) is computed once and
+    kept sorted, as are the enrollments; a reclassification is then two binary searches plus one
+    vectorized pass. Schools whose radius is within rounding of the queried one are rechecked
+    with HighSchoolIndex.any_within, so the table matches classify_schools exactly.
+    With nearest_high_km given (e.g. road distances), isolation compares those distances instead.
+    """
+
+    def __init__(self, schools, high_school_index=None, nearest_high_km=None):
+        """
+        Args:
+            schools: DataFrame with 'Level', 'Lat', 'Lng' and 'total_enrollment' columns
+            high_school_index: Optional prebuilt HighSchoolIndex, built from the High rows otherwise
+            nearest_high_km: Optional distance of every school to its nearest high school (only
+                the Middle rows are read), e.g. road travel distances, used instead of the k-NN query
+        """
+        level = schools['Level']
+        self.index = schools.index
+        self.is_high = (level == "High").to_numpy()
+        self.is_middle = (level == "Middle").to_numpy()
+        lats = schools['Lat'].to_numpy(dtype=np.float64)
+        lngs = schools['Lng'].to_numpy(dtype=np.float64)
+        self.nearest_high_km = np.full(len(schools), np.nan)
+        middle = np.flatnonzero(self.is_middle)
+        if nearest_high_km is not None:
+            self.nearest_high_km[middle] = np.asarray(nearest_high_km, dtype=np.float64)[middle]
+            isolation_km = self.nearest_high_km[middle]
+            self.high_school_index = None
+        else:
+            if high_school_index is None:
+                high_school_index = HighSchoolIndex(lats[self.is_high], lngs[self.is_high])
+            self.high_school_index = high_school_index
+            self.nearest_high_km[middle] = high_school_index.nearest_distance(lats[middle], lngs[middle])
+            isolation_km = high_school_index.admitting_radius(lats[middle], lngs[middle])
+        # Middle schools ordered by isolation radius: the isolated ones are a suffix for any radius
+        order = np.argsort(isolation_km, kind='stable')
+        self.by_distance = middle[order]
+        self.sorted_distance = isolation_km[order]
+        self.sorted_lats, self.sorted_lngs = lats[self.by_distance], lngs[self.by_distance]
+
+        # Missing enrollment never counts as high enrollment
+        enrollment = pd.to_numeric(schools['total_enrollment'], errors='coerce').to_numpy(dtype=np.float64)
+        enrollment = np.nan_to_num(enrollment, nan=-np.inf)
+        self.by_enrollment = np.argsort(enrollment, kind='stable')
+        self.sorted_enrollment = enrollment[self.by_enrollment]
+
+    def masks(self, radius_km=5.0, enrollment_threshold=200):
+        """Boolean isolated and high_enrollment arrays for one pair of thresholds."""
+        isolated = np.zeros(len(self.index), dtype=bool)
+        isolated[self.by_distance[np.searchsorted(self.sorted_distance, radius_km, side='right'):]] = True
+        if self.high_school_index is not None:
+            # The box test of the exact check rounds differently from admitting_radius
+            start = np.searchsorted(self.sorted_distance, radius_km * (1 - 1e-9) - 1e-12, side='left')
+            stop = np.searchsorted(self.sorted_distance, radius_km * (1 + 1e-9) + 1e-12, side='right')
+            if start < stop:
+                isolated[self.by_distance[start:stop]] = ~self.high_school_index.any_within(
+                    self.sorted_lats[start:stop], self.sorted_lngs[start:stop], radius_km)
+        high_enrollment = np.zeros(len(self.index), dtype=bool)
+        high_enrollment[self.by_enrollment[
+            np.searchsorted(self.sorted_enrollment, enrollment_threshold, side='right'):]] = True
+        return isolated, high_enrollment
+
+    def classify(self, radius_km=5.0, enrollment_threshold=200):
+        """Same table as classify_schools for these thresholds; isolation by nearest_high_km when that was given."""
+        isolated, high_enrollment = self.masks(radius_km, enrollment_threshold)
+        # Positions in SCHOOL_STATUS_STYLE: High, Near High, Isolated - High/Low Enrollment, Other
+        codes = np.select(
+            [self.is_high, self.is_middle & ~isolated, isolated & high_enrollment, isolated],
+            [0, 1, 2, 3],
+            default=4
+        )
+        return pd.DataFrame({
+            'nearest_high_km': self.nearest_high_km,
+            'isolated': isolated,
+            'high_enrollment': high_enrollment,
+            'status': _STATUS_LABELS[codes],
+            'fill_color': _STATUS_FILLS[codes],
+            'border_color': _STATUS_BORDERS[codes],
+        }, index=self.index)
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+import pandas as pd
+
+TABLE_CACHE_DIR = os.path.join('.cache', 'tables')
+
+# Column types for the school CSVs: repeated labels are stored as categoricals
+SCHOOL_CATEGORICALS = ['Level', 'Gender', 's_level', 's_type']
+
+_loaded = {}  # In-process copies, keyed by cache file, so reruns skip even the Parquet read
+
+
+def file_hash(path, block_size=1 << 20):
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+@contextmanager
+def atomic_path(path):
+    """
+    Temporary path next to path, moved over path when the block exits without an error.
+    Readers see either the old file or the complete new one, never a partial write. The name
+    carries the process and thread id, so concurrent writers (e.g. Streamlit sessions, which
+    are threads of one process) never share a temporary file; it is removed on failure.
+    """
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _cache_paths(csv_path, cache_dir):
+    abs_path = os.path.abspath(csv_path)
+    name = os.path.splitext(os.path.basename(abs_path))[0]
+    key = hashlib.sha1(abs_path.encode()).hexdigest()[:12]
+    base = os.path.join(cache_dir, f"{name}-{key}")
+    return f"{base}.parquet", f"{base}.json"
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size}
+
+
+def data_version(*paths):
+    """Cheap version key for a set of input files: (absolute path, mtime, size) of each."""
+    return tuple((os.path.abspath(path), *_source_signature(path).values()) for path in paths)
+
+
+def load_table(csv_path, categoricals=SCHOOL_CATEGORICALS, cache_dir=TABLE_CACHE_DIR, **read_csv_kwargs):
+    """
+    Load a CSV through a typed Parquet copy that is rebuilt only when the source changes.
+    The source mtime and size are checked first; when they differ the content hash decides,
+    so a touched but unchanged file does not trigger a rebuild.
+    Args:
+        csv_path: Source CSV (e.g. PunjabLoc.csv)
+        categoricals: Columns stored as pandas categoricals when present
+        cache_dir: Directory for the Parquet file and its metadata
+        read_csv_kwargs: Passed to pd.read_csv when the cache is (re)built
+    Returns:
+        DataFrame: Shared in-process copy, callers should not modify it in place
+    """
+    parquet_path, meta_path = _cache_paths(csv_path, cache_dir)
+    signature = _source_signature(csv_path)
+
+    meta = None
+    if os.path.exists(parquet_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if meta['source'] != signature:
+            if meta['sha256'] == file_hash(csv_path):
+                meta['source'] = signature
+                _write_meta(meta_path, meta)
+            else:
+                meta = None
+
+    if meta is None:
+        _loaded.pop(parquet_path, None)
+        meta = _build_table(csv_path, parquet_path, meta_path, signature, categoricals, read_csv_kwargs)
+
+    cached = _loaded.get(parquet_path)
+    if cached is not None and cached[0] == meta['sha256']:
+        return cached[1]
+    df = pd.read_parquet(parquet_path)
+    _loaded[parquet_path] = (meta['sha256'], df)
+    return df
+
+
+def _build_table(csv_path, parquet_path, meta_path, signature, categoricals, read_csv_kwargs):
+    df = pd.read_csv(csv_path, **read_csv_kwargs)
+    for column in categoricals:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    os.makedirs(os.path.dirname(parquet_path), exist_ok=True)
+    with atomic_path(parquet_path) as tmp_path:
+        df.to_parquet(tmp_path, index=False)
+    meta = {'source': signature, 'sha256': file_hash(csv_path), 'csv_path': os.path.abspath(csv_path)}
+    _write_meta(meta_path, meta)
+    return meta
+
+
+def _write_meta(meta_path, meta):
+    with atomic_path(meta_path) as tmp_path, open(tmp_path, 'w') as f:
+        json.dump(meta, f, indent=2)
@@ -0,0 +1,115 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from data_cache import atomic_path
+from grid_mask import GridTransform, cell_indices
+from population_ingest import read_xyz_chunks, scan_grid
+
+RASTER_FILE = 'density.npy'
+TRANSFORM_FILE = 'transform.json'
+NODATA = np.nan  # Cells without a density value
+
+
+def build_density_raster(src_path, raster_dir, grid=None, chunk_rows=500_000):
+    """
+    Convert a long-format density CSV (WorldPop XYZ or file3.csv) into an on-disk float32 raster.
+    The array is filled chunk by chunk through a memory map, so the CSV is never fully in memory.
+    Args:
+        src_path: CSV with X/Y/Z or Longitude/Latitude/Population Density at 1km columns
+        raster_dir: Output directory for density.npy and transform.json
+        grid: Optional GridTransform, inferred from the CSV when not given
+        chunk_rows: Rows per CSV chunk
+    Returns:
+        DensityRaster: The new raster, opened read-only
+    """
+    grid = grid or scan_grid(src_path, chunk_rows)
+    os.makedirs(raster_dir, exist_ok=True)
+    # The transform goes in first and density.npy last: the npy is the commit marker that
+    # ensure_density_raster checks, so it never sees a raster without its matching transform
+    with atomic_path(os.path.join(raster_dir, RASTER_FILE)) as tmp_path:
+        values = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(grid.n_rows, grid.n_cols))
+        values[:] = NODATA
+        for chunk in read_xyz_chunks(src_path, chunk_rows):
+            rows, cols, valid = cell_indices(grid, chunk['Longitude'].to_numpy(), chunk['Latitude'].to_numpy())
+            values[rows[valid], cols[valid]] = chunk['Population Density at 1km'].to_numpy()[valid]
+        values.flush()
+        del values
+        with atomic_path(os.path.join(raster_dir, TRANSFORM_FILE)) as tmp_transform, open(tmp_transform, 'w') as f:
+            json.dump({'transform': grid._asdict(), 'source': os.path.abspath(src_path)}, f, indent=2)
+    return DensityRaster(raster_dir)
+
+
+def ensure_density_raster(src_path, raster_dir=None, chunk_rows=500_000):
+    """Open the raster next to src_path, (re)building it when missing or older than the CSV."""
+    raster_dir = raster_dir or os.path.splitext(src_path)[0] + '_raster'
+    raster_path = os.path.join(raster_dir, RASTER_FILE)
+    if (os.path.exists(raster_path) and os.path.exists(os.path.join(raster_dir, TRANSFORM_FILE)) and
+            os.path.getmtime(raster_path) >= os.path.getmtime(src_path)):
+        return DensityRaster(raster_dir)
+    return build_density_raster(src_path, raster_dir, chunk_rows=chunk_rows)
+
+
+class DensityRaster:
+    """
+    Read-only, memory-mapped population density grid with its affine grid transform.
+    Every process that opens the same directory shares one copy through the OS page cache.
+    """
+
+    def __init__(self, raster_dir):
+        with open(os.path.join(raster_dir, TRANSFORM_FILE)) as f:
+            self.transform = GridTransform(**json.load(f)['transform'])
+        self.values = np.load(os.path.join(raster_dir, RASTER_FILE), mmap_mode='r')
+
+    @property
+    def shape(self):
+        return self.values.shape
+
+    def valid_mask(self, values=None):
+        """Boolean array, True where a cell has data."""
+        return ~np.isnan(self.values if values is None else values)
+
+    def cell_center(self, rows, cols):
+        """Longitude and latitude of cell centres."""
+        t = self.transform
+        return t.origin_lon + np.asarray(cols) * t.cell_lon, t.origin_lat + np.asarray(rows) * t.cell_lat
+
+    def lookup(self, lons, lats):
+        """Density of the cell containing each point, NaN outside the grid or on nodata cells."""
+        rows, cols, valid = cell_indices(self.transform, lons, lats)
+        out = np.full(len(rows), np.nan, dtype=np.float32)
+        out[valid] = self.values[rows[valid], cols[valid]]
+        return out
+
+    def window(self, row, col, n_rows, n_cols):
+        """Array view of a rectangular block of cells, clipped to the grid."""
+        # Cells before the grid edge are cut from the block, not shifted into it
+        n_rows, n_cols = max(n_rows + min(row, 0), 0), max(n_cols + min(col, 0), 0)
+        row, col = max(row, 0), max(col, 0)
+        return self.values[row:row + n_rows, col:col + n_cols]
+
+    def crop(self, min_lon, min_lat, max_lon, max_lat):
+        """
+        Cells whose centres fall inside a bounding box.
+        Returns:
+            tuple: (array view, GridTransform of the view)
+        """
+        t = self.transform
+        col0 = max(int(np.ceil((min_lon - t.origin_lon) / t.cell_lon)), 0)
+        col1 = min(int(np.floor((max_lon - t.origin_lon) / t.cell_lon)), t.n_cols - 1)
+        row0 = max(int(np.ceil((min_lat - t.origin_lat) / t.cell_lat)), 0)
+        row1 = min(int(np.floor((max_lat - t.origin_lat) / t.cell_lat)), t.n_rows - 1)
+        n_rows, n_cols = max(row1 - row0 + 1, 0), max(col1 - col0 + 1, 0)
+        sub = GridTransform(t.origin_lon + col0 * t.cell_lon, t.origin_lat + row0 * t.cell_lat,
+                            t.cell_lon, t.cell_lat, n_cols, n_rows)
+        return self.window(row0, col0, n_rows, n_cols), sub
+
+    def to_frame(self):
+        """Long-format latitude/longitude/population_density frame of the cells with data."""
+        rows, cols = np.nonzero(self.valid_mask())
+        lons, lats = self.cell_center(rows, cols)
+        return pd.DataFrame({
+            'latitude': lats,
+            'longitude': lons,
+            'population_density': self.values[rows, cols].astype(np.float64),
+        })
@@ -0,0 +1,103 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import time
+from contextlib import contextmanager
+
+PROFILE_ENV = 'SCHOOLMAP_PROFILE'  # Set to 1 to capture a cProfile of every rerun
+LOG_ENV = 'SCHOOLMAP_TIMING_LOG'  # JSON-lines log path; set to an empty string to disable logging
+DEFAULT_LOG = os.path.join('.cache', 'diagnostics', 'timings.jsonl')
+
+
+def profiling_enabled():
+    return os.getenv(PROFILE_ENV, '').lower() in ('1', 'true', 'yes')
+
+
+class RerunTimer:
+    """
+    Wall-clock spans for the stages of one Streamlit rerun, optionally with a cProfile capture.
+    Spans nest; each is recorded when it starts, so parents are listed before their children.
+    """
+
+    def __init__(self, profile=None):
+        """
+        Args:
+            profile: Capture a cProfile of the rerun; taken from SCHOOLMAP_PROFILE when None
+        """
+        self.started = time.perf_counter()
+        self.spans = []  # Dicts with name, depth and seconds
+        self.total = None
+        self._open = []  # (span, start time) of the spans not yet closed
+        self.profiler = None
+        if profile is None:
+            profile = profiling_enabled()
+        if profile:
+            self.profiler = cProfile.Profile()
+            try:
+                self.profiler.enable()
+            except ValueError:
+                # Another profiler is already active in this thread
+                self.profiler = None
+
+    def begin(self, name):
+        """Open a span; for stages too long to indent under a with block."""
+        entry = {'name': name, 'depth': len(self._open), 'seconds': None}
+        self.spans.append(entry)
+        self._open.append((entry, time.perf_counter()))
+        return entry
+
+    def end(self):
+        """Close the innermost open span."""
+        entry, start = self._open.pop()
+        entry['seconds'] = time.perf_counter() - start
+        return entry
+
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block as one stage."""
+        entry = self.begin(name)
+        try:
+            yield entry
+        finally:
+            self.end()
+
+    def finish(self):
+        """Stop the clock and the profiler; returns the total rerun time in seconds."""
+        if self.total is None:
+            self.total = time.perf_counter() - self.started
+            if self.profiler is not None:
+                self.profiler.disable()
+        return self.total
+
+    def profile_text(self, limit=30, sort='cumulative'):
+        """Top functions of the cProfile capture as text, None when profiling is off."""
+        if self.profiler is None:
+            return None
+        out = io.StringIO()
+        pstats.Stats(self.profiler, stream=out).sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+    def record(self, **extra):
+        """JSON-serializable summary of the rerun; extra fields are added as given."""
+        return {
+            'timestamp': time.time(),
+            'total_seconds': self.finish(),
+            'spans': self.spans,
+            'profiled': self.profiler is not None,
+            **extra,
+        }
+
+
+def append_jsonl(record, path=None):
+    """Append one record to the timing log (SCHOOLMAP_TIMING_LOG, or DEFAULT_LOG when unset)."""
+    path = os.getenv(LOG_ENV, DEFAULT_LOG) if path is None else path
+    if not path:
+        return None
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+    return path
@@ -0,0 +1,51 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371  # Earth radius in km, shared by every distance in the apps
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in km between paired points.
+    Inputs are scalars or float64 arrays in degrees and broadcast against each other, so this
+    covers both the single pair used by the distance calculator and paired arrays.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2 +
+         np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    # Rounding can push a a hair outside [0, 1] for coincident or antipodal points
+    c = 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    return c * EARTH_RADIUS_KM
+
+
+def haversine_one_to_many(lat, lon, lats, lons):
+    """Distance in km from one point to every point of the lats/lons arrays."""
+    return haversine_km(lat, lon, lats, lons)
+
+
+def haversine_blocks(lats1, lons1, lats2, lons2, max_elements=4_000_000):
+    """
+    Many-to-many distances computed in row blocks so memory stays bounded.
+    Args:
+        lats1, lons1: Row points (e.g. middle schools)
+        lats2, lons2: Column points (e.g. high schools)
+        max_elements: Upper bound on the number of float64 values in one block
+    Yields:
+        tuple: (start, stop, block) where block[i, j] is the distance from row start + i to column j
+    """
+    lats1 = np.asarray(lats1, dtype=np.float64)
+    lons1 = np.asarray(lons1, dtype=np.float64)
+    lats2 = np.asarray(lats2, dtype=np.float64)
+    lons2 = np.asarray(lons2, dtype=np.float64)
+    rows = max(1, max_elements // max(1, len(lats2)))
+    for start in range(0, len(lats1), rows):
+        stop = min(start + rows, len(lats1))
+        block = haversine_km(lats1[start:stop, None], lons1[start:stop, None], lats2[None, :], lons2[None, :])
+        yield start, stop, block
+
+
+def haversine_matrix(lats1, lons1, lats2, lons2, max_elements=4_000_000):
+    """Full many-to-many distance matrix in km, filled block by block."""
+    out = np.empty((len(lats1), len(lats2)), dtype=np.float64)
+    for start, stop, block in haversine_blocks(lats1, lons1, lats2, lons2, max_elements):
+        out[start:stop] = block
+    return out
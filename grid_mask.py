@@ -0,0 +1,111 @@
+import hashlib
+import os
+from collections import namedtuple
+import numpy as np
+import pandas as pd
+from data_cache import atomic_path
+from point_in_polygon import polygon_edges
+
+# Regular lat/lon lattice of cell centres: lon = origin_lon + col * cell_lon, lat = origin_lat + row * cell_lat
+GridTransform = namedtuple('GridTransform', ['origin_lon', 'origin_lat', 'cell_lon', 'cell_lat', 'n_cols', 'n_rows'])
+
+MASK_CACHE_DIR = os.path.join('.cache', 'region_masks')
+
+
+def infer_grid(lons, lats):
+    """
+    Recover the grid transform of a regular lattice given as scattered cell-centre points,
+    e.g. the WorldPop 1 km ASCII XYZ file.
+    """
+    transform = []
+    for values in (lons, lats):
+        unique = np.unique(np.asarray(values, dtype=np.float64))
+        step = float(np.median(np.diff(unique))) if len(unique) > 1 else 1.0
+        count = int(round((unique[-1] - unique[0]) / step)) + 1
+        if count > 1:
+            # Spread the rounding error of individual steps over the full extent
+            step = float(unique[-1] - unique[0]) / (count - 1)
+        transform.append((float(unique[0]), step, count))
+    (origin_lon, cell_lon, n_cols), (origin_lat, cell_lat, n_rows) = transform
+    return GridTransform(origin_lon, origin_lat, cell_lon, cell_lat, n_cols, n_rows)
+
+
+def cell_indices(transform, lons, lats):
+    """
+    Row and column of the grid cell for each coordinate.
+    Returns:
+        tuple: (rows, cols, valid) arrays; valid is False for points outside the grid
+    """
+    cols = np.rint((np.asarray(lons, dtype=np.float64) - transform.origin_lon) / transform.cell_lon).astype(np.intp)
+    rows = np.rint((np.asarray(lats, dtype=np.float64) - transform.origin_lat) / transform.cell_lat).astype(np.intp)
+    valid = (cols >= 0) & (cols < transform.n_cols) & (rows >= 0) & (rows < transform.n_rows)
+    return rows, cols, valid
+
+
+def rasterize_region(geometry, transform):
+    """
+    Scanline fill of a GeoJSON (Multi)Polygon onto the grid's cell centres.
+    Every edge is intersected with the scanlines it crosses; a crossing at x toggles all cells
+    with centre left of x, which is the same even-odd rule as ray_cast in point_in_polygon.
+    Returns:
+        np.ndarray: Boolean array of shape (n_rows, n_cols), True for cells inside the region
+    """
+    x1, y1, x2, y2 = polygon_edges(geometry)
+    toggles = np.zeros((transform.n_rows, transform.n_cols + 1), dtype=np.int32)
+    if len(x1) == 0:
+        return np.zeros((transform.n_rows, transform.n_cols), dtype=bool)
+
+    # Candidate scanlines per edge with one row of margin, filtered exactly below
+    lo = np.floor((np.minimum(y1, y2) - transform.origin_lat) / transform.cell_lat).astype(np.intp)
+    hi = np.ceil((np.maximum(y1, y2) - transform.origin_lat) / transform.cell_lat).astype(np.intp)
+    lo = np.clip(lo, 0, transform.n_rows)
+    hi = np.clip(hi, -1, transform.n_rows - 1)
+    counts = np.maximum(hi - lo + 1, 0)
+    edge_ids = np.repeat(np.arange(len(x1)), counts)
+    run_start = np.repeat(np.cumsum(counts) - counts, counts)
+    rows = np.repeat(lo, counts) + np.arange(counts.sum()) - run_start
+
+    row_lat = transform.origin_lat + rows * transform.cell_lat
+    ex1, ey1, ex2, ey2 = x1[edge_ids], y1[edge_ids], x2[edge_ids], y2[edge_ids]
+    crosses = (ey1 > row_lat) != (ey2 > row_lat)
+    rows, row_lat = rows[crosses], row_lat[crosses]
+    ex1, ey1, ex2, ey2 = ex1[crosses], ey1[crosses], ex2[crosses], ey2[crosses]
+    x_cross = ex1 + (row_lat - ey1) * ((ex2 - ex1) / (ey2 - ey1))
+
+    # Number of cell centres strictly left of each crossing
+    col_lon = transform.origin_lon + np.arange(transform.n_cols) * transform.cell_lon
+    left_count = np.searchsorted(col_lon, x_cross, side='left')
+    np.add.at(toggles, (rows, left_count), 1)
+    # A cell is inside when an odd number of crossings lie to its right
+    right_crossings = np.cumsum(toggles[:, ::-1], axis=1)[:, ::-1][:, 1:]
+    return right_crossings % 2 == 1
+
+
+def mask_cache_key(geometry, transform):
+    """Hash of the boundary edges and the grid transform, used as the mask file name."""
+    digest = hashlib.sha256()
+    for array in polygon_edges(geometry):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    digest.update(repr(tuple(transform)).encode())
+    return digest.hexdigest()[:32]
+
+
+def load_or_rasterize(geometry, transform, cache_dir=MASK_CACHE_DIR):
+    """Rasterized region mask, read from cache_dir when the same boundary and grid were seen before."""
+    path = os.path.join(cache_dir, f"{mask_cache_key(geometry, transform)}.npy")
+    if os.path.exists(path):
+        return np.load(path)
+    mask = rasterize_region(geometry, transform)
+    os.makedirs(cache_dir, exist_ok=True)
+    # Write then rename so a concurrent reader never sees a partial file
+    with atomic_path(path) as tmp_path, open(tmp_path, 'wb') as f:
+        np.save(f, mask)
+    return mask
+
+
+def grid_clip_mask(frame, mask, transform, lon_col='Longitude', lat_col='Latitude'):
+    """Boolean Series aligned to frame from a per-cell lookup in a rasterized region mask."""
+    rows, cols, valid = cell_indices(transform, frame[lon_col].to_numpy(), frame[lat_col].to_numpy())
+    inside = np.zeros(len(frame), dtype=bool)
+    inside[valid] = mask[rows[valid], cols[valid]]
+    return pd.Series(inside, index=frame.index)
@@ -0,0 +1,98 @@
+import math
+import numpy as np
+
+TILE_SIZE_PX = 256  # Web map tile width, used to convert zoom levels to degrees per pixel
+
+
+def _pool2(array):
+    """Sum 2 x 2 blocks, padding odd edges with zeros."""
+    rows, cols = array.shape
+    padded = np.zeros((rows + rows % 2, cols + cols % 2), dtype=array.dtype)
+    padded[:rows, :cols] = array
+    return padded.reshape(padded.shape[0] // 2, 2, padded.shape[1] // 2, 2).sum(axis=(1, 3))
+
+
+class HeatmapPyramid:
+    """
+    Power-of-two aggregation pyramid over the population density grid.
+    Level 0 is the 1 km grid itself; every level above sums 2 x 2 blocks of the one below, so
+    the total density is the same at every level. Each aggregated point sits at the
+    density-weighted centroid of the cells it covers.
+    """
+
+    def __init__(self, values, transform, max_levels=12):
+        """
+        Args:
+            values: 2D density array on the grid (NaN for nodata), e.g. DensityRaster.values
+            transform: GridTransform of the array
+            max_levels: Upper bound on the number of levels
+        """
+        weight = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=0.0)
+        rows, cols = np.indices(weight.shape)
+        lon = transform.origin_lon + cols * transform.cell_lon
+        lat = transform.origin_lat + rows * transform.cell_lat
+        self.base_cell_deg = max(abs(transform.cell_lon), abs(transform.cell_lat))
+        self.levels = []
+        weight_lat, weight_lon = weight * lat, weight * lon
+        while True:
+            nonzero = weight > 0
+            self.levels.append((
+                weight_lat[nonzero] / weight[nonzero],
+                weight_lon[nonzero] / weight[nonzero],
+                weight[nonzero],
+            ))
+            if len(self.levels) >= max_levels or max(weight.shape) <= 1:
+                break
+            weight, weight_lat, weight_lon = _pool2(weight), _pool2(weight_lat), _pool2(weight_lon)
+
+    @classmethod
+    def from_raster(cls, density_raster, max_levels=12):
+        """Build the pyramid from a DensityRaster."""
+        return cls(density_raster.values, density_raster.transform, max_levels)
+
+    def level_sizes(self):
+        """Number of points at every level."""
+        return [len(weight) for _, _, weight in self.levels]
+
+    def level_for_zoom(self, zoom, radius_px=25, max_points=None):
+        """
+        Coarsest level whose cells are still smaller than one heatmap radius at this zoom,
+        made coarser until it has at most max_points points.
+        """
+        deg_per_px = 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+        target = radius_px * deg_per_px / self.base_cell_deg
+        level = int(math.floor(math.log2(target))) if target >= 1 else 0
+        level = min(max(level, 0), len(self.levels) - 1)
+        if max_points is not None:
+            while level < len(self.levels) - 1 and len(self.levels[level][2]) > max_points:
+                level += 1
+        return level
+
+    def _in_bbox(self, level, bbox):
+        lat, lon, _ = self.levels[level]
+        min_lon, min_lat, max_lon, max_lat = bbox
+        return (lon >= min_lon) & (lon <= max_lon) & (lat >= min_lat) & (lat <= max_lat)
+
+    def level_for_view(self, zoom, bbox=None, radius_px=25, max_points=None):
+        """
+        Like level_for_zoom, but max_points only counts the points inside bbox
+        (min_lon, min_lat, max_lon, max_lat), so zoomed-in views keep the fine levels.
+        """
+        if bbox is None:
+            return self.level_for_zoom(zoom, radius_px, max_points)
+        level = self.level_for_zoom(zoom, radius_px)
+        if max_points is not None:
+            while level < len(self.levels) - 1 and np.count_nonzero(self._in_bbox(level, bbox)) > max_points:
+                level += 1
+        return level
+
+    def heat_data(self, level, bbox=None):
+        """
+        [lat, lng, weight] rows for folium's HeatMap at one level, optionally only inside bbox.
+        Positions are rounded to 1e-5 degrees (about 1 m) and weights to 0.1 to keep the payload short.
+        """
+        lat, lon, weight = self.levels[level]
+        if bbox is not None:
+            inside = self._in_bbox(level, bbox)
+            lat, lon, weight = lat[inside], lon[inside], weight[inside]
+        return np.column_stack((np.round(lat, 5), np.round(lon, 5), np.round(weight, 1))).tolist()
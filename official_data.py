@@ -3,7 +3,18 @@ import folium
 from streamlit_folium import st_folium
 import json
 import pandas as pd
-import math
+from geo_distance import haversine_km
+from data_cache import data_version, load_table
+from density_raster import ensure_density_raster
+from heatmap_pyramid import HeatmapPyramid
+from streaming_stats import array_stats
+from school_layer import SchoolLayer, school_feature_collection
+from viewport import BBoxIndex, degrees_per_pixel
+
+SCHOOL_CLICK_PX = 10  # Clicks within this many pixels of a school marker select it
+
+HEATMAP_MAX_POINTS = 20_000  # Upper bound on heatmap points sent to the browser
+POPULATION_CSV = '/Users/muhammadwisalabdullah/Downloads/file3.csv'
 
 # Set page configuration for full-width display
 st.set_page_config(
@@ -14,7 +25,7 @@ st.set_page_config(
 )
 
 # Load data
-dataframe_pop = pd.read_csv('/Users/muhammadwisalabdullah/Downloads/list of Lahore schools with coordinates.csv')
+dataframe_pop = load_table('/Users/muhammadwisalabdullah/Downloads/list of Lahore schools with coordinates.csv')
 # mandiframe = pd.read_csv('/Users/muhammadwisalabdullah/Downloads/mandi_data.csv')
 
 # Filter for both High and Middle schools (Male)
@@ -23,44 +34,42 @@ filtered_data = dataframe_pop[
     (dataframe_pop['s_type'] == "Male")
     ]
 
+
+
+@st.cache_resource(show_spinner="Preparing heatmap...")
+def load_heatmap_pyramid(version):
+    """Aggregation pyramid of the density raster, built once per data_version(POPULATION_CSV)."""
+    return HeatmapPyramid.from_raster(ensure_density_raster(POPULATION_CSV))
+
+
 # mandifilter = mandiframe[(mandiframe['school_gender'] == "Male") & (mandiframe['school_level'] == "High")]
-records = pd.read_csv("/Users/muhammadwisalabdullah/Downloads/file3.csv")
-records['count'] = range(1, len(records) + 1)
-
-# Sample data creation
-data = {
-    'latitude': records['Latitude'],
-    'longitude': records['Longitude'],
-    'population_density': records['Population Density at 1km'],
-}
+density_raster = ensure_density_raster(POPULATION_CSV)
 
-df = pd.DataFrame(data)
-
-# Calculate statistics
-stats = {
-    'max': df['population_density'].max(),
-    'min': df['population_density'].min(),
-    'mean': df['population_density'].mean(),
-    'median': df['population_density'].median(),
-    'std': df['population_density'].std(),
-    'total_points': len(df),
-    'q25': df['population_density'].quantile(0.25),
-    'q75': df['population_density'].quantile(0.75),
-    'q90': df['population_density'].quantile(0.90)
-}
+# Population density cells from the memory-mapped raster
+df = density_raster.to_frame()
+
+# View reported by the map component (key 'density_map') before this rerun; the zoom drives
+# the heatmap level of detail
+view_state = st.session_state.get('density_map') or {}
+map_zoom = view_state.get('zoom') or 10
+
+# Calculate statistics in one streaming pass over the raster rows (quantiles within 0.5%)
+stats = array_stats(density_raster.values).summary()
 
 # Create base map with better initial view
 m = folium.Map(
     location=[df['latitude'].mean(), df['longitude'].mean()],
-    zoom_start=10,  # Increased zoom for better initial view
+    zoom_start=10,  # Fixed, so the base map HTML and the user's view survive reruns
     tiles='CartoDB positron',
     control_scale=True,
     prefer_canvas=True
 )
 
 # Prepare heat data: [lat, lng, weight]
-heat_data = [[row['latitude'], row['longitude'], row['population_density']]
-             for index, row in df.iterrows()]
+# Heat data from the aggregation pyramid: level picked for the current zoom, payload capped
+population_version = data_version(POPULATION_CSV)
+heatmap_pyramid = load_heatmap_pyramid(population_version)
+heat_level = heatmap_pyramid.level_for_zoom(map_zoom, radius_px=25, max_points=HEATMAP_MAX_POINTS)
 
 # Create colormap
 from branca.colormap import LinearColormap
@@ -85,13 +94,21 @@ gradient = {
 # Add heat map layer
 from folium.plugins import HeatMap
 
-HeatMap(heat_data,
-        min_opacity=0.3,
-        max_zoom=18,
-        radius=25,
-        blur=15,
-        gradient=gradient
-        ).add_to(m)
+# The heatmap is the only zoom-dependent layer: it is sent through feature_group_to_add so the
+# base map stays mounted, and rebuilt per session only when the pyramid level changes
+heat_key = (population_version, heat_level)
+if st.session_state.get('heat_layer_key') != heat_key:
+    heat_layer = folium.FeatureGroup(name='Heatmap')
+    HeatMap(heatmap_pyramid.heat_data(heat_level),
+            min_opacity=0.3,
+            max_zoom=18,
+            radius=25,
+            blur=15,
+            gradient=gradient
+            ).add_to(heat_layer)
+    st.session_state.heat_layer = heat_layer
+    st.session_state.heat_layer_key = heat_key
+heat_layer = st.session_state.heat_layer
 
 # Add colormap to map
 colormap.add_to(m)
@@ -200,70 +217,28 @@ title_html = '''
 '''
 m.get_root().html.add_child(folium.Element(title_html))
 
-# Add school circles with different colors based on school level
-for index, row in filtered_data.iterrows():
-    radius = 1000
-    school_name = row['s_name']
-    school_level = row['s_level']
-
-    # Set color based on school level
-    if school_level == "High":
-        fill_color = "green"
-        border_color = "darkgreen"
-    elif school_level == "Middle":
-        fill_color = "purple"
-        border_color = "darkpurple"
-    else:
-        fill_color = "blue"  # Default color for other levels
-        border_color = "darkblue"
-
-    # Create a detailed popup with all requested information
-    popup_text = f"""
-    <div style="font-family: Arial, sans-serif; max-width: 300px;">
-        <h3 style="margin: 0 0 10px 0; color: #0078D7; border-bottom: 2px solid #0078D7; padding-bottom: 5px;">
-            {school_name}
-        </h3>
-        <table style="width: 100%; border-collapse: collapse;">
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold; width: 30%;">School ID:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['s_id']}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Level:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; color: {fill_color}; font-weight: bold;">{school_level}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Type:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['s_type']}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Latitude:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['lat']:.6f}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Longitude:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{row['lng']:.6f}</td>
-            </tr>
-            <tr>
-                <td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Radius:</td>
-                <td style="padding: 5px; border-bottom: 1px solid #eee;">{radius} meters</td>
-            </tr>
-        </table>
-    </div>
-    """
-
-    folium.Circle(
-        location=[row['lat'], row['lng']],
-        radius=radius,
-        color=border_color,
-        weight=2,
-        fill_opacity=0.7,
-        opacity=1,
-        fill_color=fill_color,
-        fill=True,
-        popup=folium.Popup(popup_text, max_width=350),
-        tooltip=f"{school_level} School: {school_name}",
-    ).add_to(m)
+# Colours per school level, applied client-side
+level_styles = {
+    'High': ("green", "darkgreen"),
+    'Middle': ("purple", "darkpurple"),
+    'Other': ("blue", "darkblue"),  # Default color for other levels
+}
+
+# Add all schools as one clustered GeoJSON layer instead of one circle per school
+school_features = school_feature_collection(
+    filtered_data,
+    filtered_data['s_level'],
+    # Tooltip attributes only; the details panel is built when a school is clicked
+    properties={'id': 's_id', 'name': 's_name', 'level': 's_level'},
+    lat_col='lat',
+    lng_col='lng',
+)
+SchoolLayer(
+    school_features,
+    level_styles,
+    name_property='name',
+).add_to(m)
+school_index = BBoxIndex(filtered_data['lng'], filtered_data['lat'])
 
 # Count schools by level for the legend
 high_school_count = len(filtered_data[filtered_data['s_level'] == "High"])
@@ -337,7 +312,9 @@ with col_map:
         m,
         width=1200,  # Increased width
         height=800,  # Increased height
-        returned_objects=["last_clicked", "bounds", "zoom"]
+        key='density_map',
+        feature_group_to_add=heat_layer,
+        returned_objects=["last_clicked", "last_object_clicked", "bounds", "zoom"]
     )
 
 with col_info:
@@ -359,6 +336,20 @@ with col_info:
         lng = map_data["last_clicked"]["lng"]
         st.success(f"**Last Click:** {lat:.6f}, {lng:.6f}")
 
+    # School details, looked up from the clicked marker position instead of embedded popups
+    if map_data and map_data.get("last_object_clicked"):
+        clicked = map_data["last_object_clicked"]
+        school_pos = school_index.nearest(
+            clicked["lng"], clicked["lat"], SCHOOL_CLICK_PX * degrees_per_pixel(map_data.get("zoom") or map_zoom))
+        if school_pos is not None:
+            school = filtered_data.iloc[school_pos]
+            st.subheader(school['s_name'])
+            st.table(pd.DataFrame({
+                'Field': ['School ID', 'Level', 'Type', 'Latitude', 'Longitude'],
+                'Value': [str(school['s_id']), str(school['s_level']), str(school['s_type']),
+                          f"{school['lat']:.6f}", f"{school['lng']:.6f}"],
+            }).set_index('Field'))
+
 # Initialize session state for clicked coordinates history
 if 'click_history' not in st.session_state:
     st.session_state.click_history = []
@@ -399,24 +390,10 @@ with tab1:
         point2_lon = st.number_input("Longitude", value=74.3436, format="%.6f", key="point2_lon")
 
 
-    # Calculate distance function
-    def calculate_distance(lat1, lon1, lat2, lon2):
-        # Haversine formula
-        R = 6371  # Earth radius in kilometers
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = (math.sin(dlat / 2) * math.sin(dlat / 2) +
-             math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) *
-             math.sin(dlon / 2) * math.sin(dlon / 2))
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
-        return distance
-
-
     # Calculate and display results
     if st.button("Calculate Distance", type="primary", key="calc_dist"):
         try:
-            distance_km = calculate_distance(point1_lat, point1_lon, point2_lat, point2_lon)
+            distance_km = float(haversine_km(point1_lat, point1_lon, point2_lat, point2_lon))
 
             st.success(f"**Distance between points:** {distance_km:.2f} kilometers")
 
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+
+def geometry_rings(geometry):
+    """
+    List every ring of a GeoJSON Polygon or MultiPolygon as an (n, 2) array of [lon, lat].
+    Outer rings and holes are returned alike; the even-odd rule used below treats a point
+    inside a hole as outside the region without needing to know which ring is which.
+    """
+    if geometry['type'] == 'Polygon':
+        polygons = [geometry['coordinates']]
+    elif geometry['type'] == 'MultiPolygon':
+        polygons = geometry['coordinates']
+    else:
+        raise ValueError(f"Unsupported geometry type: {geometry['type']}")
+    return [np.asarray(ring, dtype=np.float64)[:, :2] for polygon in polygons for ring in polygon]
+
+
+def polygon_edges(geometry):
+    """
+    Edge arrays of every ring, closing rings that do not repeat their first vertex.
+    Returns:
+        tuple: (x1, y1, x2, y2) float64 arrays with x = longitude and y = latitude
+    """
+    starts, ends = [], []
+    for ring in geometry_rings(geometry):
+        if len(ring) < 2:
+            continue
+        if not np.array_equal(ring[0], ring[-1]):
+            ring = np.vstack([ring, ring[:1]])
+        starts.append(ring[:-1])
+        ends.append(ring[1:])
+    if not starts:
+        empty = np.empty(0, dtype=np.float64)
+        return empty, empty, empty, empty
+    start = np.concatenate(starts)
+    end = np.concatenate(ends)
+    # Horizontal edges never cross a horizontal ray
+    keep = start[:, 1] != end[:, 1]
+    return start[keep, 0], start[keep, 1], end[keep, 0], end[keep, 1]
+
+
+def ray_cast(edges, lons, lats, max_pairs=8_000_000):
+    """
+    Even-odd ray casting of many points against the same edges.
+    A ray is cast towards +longitude from every point and crossings are counted per point.
+    Args:
+        edges: (x1, y1, x2, y2) arrays from polygon_edges
+        lons, lats: Point coordinates
+        max_pairs: Upper bound on point x edge pairs evaluated at once, bounds memory
+    Returns:
+        np.ndarray: Boolean array, True for points inside the region
+    """
+    x1, y1, x2, y2 = edges
+    lons = np.asarray(lons, dtype=np.float64)
+    lats = np.asarray(lats, dtype=np.float64)
+    inside = np.zeros(len(lons), dtype=bool)
+    if len(x1) == 0:
+        return inside
+    slope = (x2 - x1) / (y2 - y1)
+    rows = max(1, max_pairs // len(x1))
+    for start in range(0, len(lons), rows):
+        px = lons[start:start + rows, None]
+        py = lats[start:start + rows, None]
+        crosses = ((y1 > py) != (y2 > py)) & (px < x1 + (py - y1) * slope)
+        inside[start:start + rows] = np.count_nonzero(crosses, axis=1) % 2 == 1
+    return inside
+
+
+class PolygonIndex:
+    """
+    Latitude-band (slab) index over the edges of a region boundary, built once per boundary.
+    Points outside the bounding box are rejected without any edge test, and every other point
+    is only tested against the edges whose latitude range overlaps its band, i.e. the few
+    edges that can cross its horizontal ray.
+    """
+
+    def __init__(self, geometry, n_bands=None):
+        self.x1, self.y1, self.x2, self.y2 = polygon_edges(geometry)
+        n_edges = len(self.x1)
+        if n_edges:
+            self.bbox = (min(self.x1.min(), self.x2.min()), min(self.y1.min(), self.y2.min()),
+                         max(self.x1.max(), self.x2.max()), max(self.y1.max(), self.y2.max()))
+        else:
+            self.bbox = (np.inf, np.inf, -np.inf, -np.inf)
+        # About four edges per band on average keeps both the table and the per-point work small
+        self.n_bands = n_bands or max(1, n_edges // 4)
+        min_lat, max_lat = self.bbox[1], self.bbox[3]
+        self.band_height = (max_lat - min_lat) / self.n_bands if n_edges and max_lat > min_lat else 1.0
+
+        edge_lo = self._band_of(np.minimum(self.y1, self.y2))
+        edge_hi = self._band_of(np.maximum(self.y1, self.y2))
+        counts = edge_hi - edge_lo + 1
+        edge_ids = np.repeat(np.arange(n_edges), counts)
+        # Band of each (edge, band) entry: edge_lo plus the position within the edge's run
+        run_start = np.repeat(np.cumsum(counts) - counts, counts)
+        bands = np.repeat(edge_lo, counts) + np.arange(counts.sum()) - run_start
+        order = np.argsort(bands, kind='stable')
+        self.band_edges = edge_ids[order]
+        self.band_offsets = np.concatenate([[0], np.cumsum(np.bincount(bands, minlength=self.n_bands))])
+
+    def _band_of(self, lats):
+        band = np.floor((np.asarray(lats, dtype=np.float64) - self.bbox[1]) / self.band_height)
+        return np.clip(band, 0, self.n_bands - 1).astype(np.intp)
+
+    def band_sizes(self):
+        """Number of edges stored in each latitude band."""
+        return np.diff(self.band_offsets)
+
+    def contains(self, lons, lats, chunk_size=200_000):
+        """
+        Boolean mask of points inside the region, same result as ray_cast over all edges.
+        Args:
+            lons, lats: Point coordinates
+            chunk_size: Number of points handled per chunk
+        Returns:
+            np.ndarray: Boolean array aligned with the input points
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        inside = np.zeros(len(lons), dtype=bool)
+        min_lon, min_lat, max_lon, max_lat = self.bbox
+        for start in range(0, len(lons), chunk_size):
+            px = lons[start:start + chunk_size]
+            py = lats[start:start + chunk_size]
+            candidates = np.flatnonzero((px >= min_lon) & (px <= max_lon) & (py >= min_lat) & (py <= max_lat))
+            if len(candidates) == 0:
+                continue
+            bands = self._band_of(py[candidates])
+            order = np.argsort(bands, kind='stable')
+            candidates, bands = candidates[order], bands[order]
+            band_ids, first = np.unique(bands, return_index=True)
+            last = np.append(first[1:], len(bands))
+            for band, lo, hi in zip(band_ids, first, last):
+                edge_ids = self.band_edges[self.band_offsets[band]:self.band_offsets[band + 1]]
+                edges = (self.x1[edge_ids], self.y1[edge_ids], self.x2[edge_ids], self.y2[edge_ids])
+                points = candidates[lo:hi]
+                inside[start + points] = ray_cast(edges, px[points], py[points])
+        return inside
+
+
+def points_in_geometry(geometry, lons, lats, chunk_size=200_000):
+    """
+    Boolean mask of points inside a GeoJSON Polygon or MultiPolygon (holes excluded).
+    Args:
+        geometry: GeoJSON geometry dict (e.g. the Nominatim 'geojson' field) or a prebuilt PolygonIndex
+        lons, lats: Point coordinates
+        chunk_size: Number of points handled per chunk
+    Returns:
+        np.ndarray: Boolean array aligned with the input points
+    """
+    index = geometry if isinstance(geometry, PolygonIndex) else PolygonIndex(geometry)
+    return index.contains(lons, lats, chunk_size)
+
+
+def clip_mask(frame, geometry, lon_col='Longitude', lat_col='Latitude', chunk_size=200_000):
+    """
+    Boolean Series aligned to frame, True for rows whose coordinates fall inside geometry.
+    Pass a PolygonIndex to reuse one boundary index across clipping calls.
+    """
+    mask = points_in_geometry(geometry, frame[lon_col].to_numpy(), frame[lat_col].to_numpy(), chunk_size)
+    return pd.Series(mask, index=frame.index)
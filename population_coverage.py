@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+from proximity import HighSchoolIndex, KM_PER_DEGREE
+
+
+def cell_area_km2(transform, lats):
+    """Area of the grid cells centred at the given latitudes, in km²."""
+    return (abs(transform.cell_lat) * KM_PER_DEGREE *
+            abs(transform.cell_lon) * KM_PER_DEGREE * np.cos(np.radians(np.asarray(lats, dtype=np.float64))))
+
+
+def distance_raster(raster, high_lats, high_lngs, block_rows=256, high_school_index=None):
+    """
+    Great-circle distance in km from every populated cell centre to its nearest high school.
+    Cells are queried against the high school k-d tree a block of rows at a time, so a
+    memory-mapped raster is never fully loaded.
+    Args:
+        raster: DensityRaster (or anything with values, transform and cell_center)
+        high_lats, high_lngs: High school coordinates
+        block_rows: Raster rows per batch query
+        high_school_index: Optional prebuilt HighSchoolIndex over the same high schools
+    Returns:
+        ndarray: float32 array shaped like the raster, NaN on nodata cells
+    """
+    index = high_school_index or HighSchoolIndex(high_lats, high_lngs)
+    distance = np.full(raster.values.shape, np.nan, dtype=np.float32)
+    for start in range(0, raster.values.shape[0], block_rows):
+        rows, cols = np.nonzero(~np.isnan(raster.values[start:start + block_rows]))
+        lons, lats = raster.cell_center(rows + start, cols)
+        distance[rows + start, cols] = index.nearest_distance(lats, lons)
+    return distance
+
+
+def coverage_curve(distances, population, max_km=30.0, step_km=0.5):
+    """
+    Population-weighted coverage curve: share of people living within each distance of a school.
+    Args:
+        distances: Distance of every cell (or person group) to the nearest high school; NaN is skipped
+        population: People in each cell
+        max_km, step_km: Distances at which the curve is evaluated, from 0 to max_km
+    Returns:
+        DataFrame: distance_km, population_within and share_within (of the total population,
+        including anyone farther than max_km)
+    """
+    distances = np.asarray(distances, dtype=np.float64).ravel()
+    population = np.nan_to_num(np.asarray(population, dtype=np.float64).ravel())
+    keep = ~np.isnan(distances)
+    order = np.argsort(distances[keep], kind='stable')
+    sorted_distance = distances[keep][order]
+    cumulative = np.concatenate([[0.0], np.cumsum(population[keep][order])])
+
+    thresholds = np.arange(0.0, max_km + step_km / 2, step_km)
+    within = cumulative[np.searchsorted(sorted_distance, thresholds, side='right')]
+    total = cumulative[-1]
+    return pd.DataFrame({
+        'distance_km': thresholds,
+        'population_within': within,
+        'share_within': within / total if total > 0 else np.zeros(len(thresholds)),
+    })
+
+
+def raster_coverage(raster, distance, max_km=30.0, step_km=0.5):
+    """
+    Coverage curve and per-cell table of a density raster and its distance_raster.
+    Returns:
+        tuple: (coverage_curve DataFrame, DataFrame of populated cells with latitude, longitude,
+        population and distance_km)
+    """
+    rows, cols = np.nonzero(~np.isnan(distance))
+    lons, lats = raster.cell_center(rows, cols)
+    population = np.nan_to_num(raster.values[rows, cols].astype(np.float64)) * cell_area_km2(raster.transform, lats)
+    cells = pd.DataFrame({
+        'latitude': lats,
+        'longitude': lons,
+        'population': population,
+        'distance_km': distance[rows, cols].astype(np.float64),
+    })
+    return coverage_curve(cells['distance_km'], cells['population'], max_km, step_km), cells
@@ -0,0 +1,86 @@
+import os
+import time
+import numpy as np
+import pandas as pd
+from grid_mask import cell_indices, infer_grid
+
+# WorldPop ASCII XYZ columns and the names used by file3.csv and both apps
+XYZ_COLUMNS = {'X': 'Longitude', 'Y': 'Latitude', 'Z': 'Population Density at 1km'}
+XYZ_DTYPES = {'X': np.float32, 'Y': np.float32, 'Z': np.float32}
+
+
+def read_xyz_chunks(path, chunk_rows=500_000):
+    """
+    Read a WorldPop XYZ file in chunks with float32 columns renamed to Longitude/Latitude/density.
+    Files already in the file3.csv layout are read the same way. Each chunk keeps the row
+    number of the full file as its index.
+    """
+    columns = set(XYZ_COLUMNS) | set(XYZ_COLUMNS.values())
+    dtypes = {**XYZ_DTYPES, **{name: XYZ_DTYPES[col] for col, name in XYZ_COLUMNS.items()}}
+    for chunk in pd.read_csv(path, dtype=dtypes, usecols=lambda c: c in columns, chunksize=chunk_rows):
+        yield chunk.rename(columns=XYZ_COLUMNS)[list(XYZ_COLUMNS.values())]
+
+
+def scan_grid(path, chunk_rows=500_000):
+    """Grid transform of an XYZ file from one streaming pass over its distinct X and Y values."""
+    lons = np.empty(0, dtype=np.float32)
+    lats = np.empty(0, dtype=np.float32)
+    for chunk in read_xyz_chunks(path, chunk_rows):
+        lons = np.union1d(lons, chunk['Longitude'].to_numpy())
+        lats = np.union1d(lats, chunk['Latitude'].to_numpy())
+    return infer_grid(lons, lats)
+
+
+def stream_clip_population(src_path, dst_path, region, density_threshold=1000, chunk_rows=500_000,
+                           raster_mask=None, grid=None, progress=None):
+    """
+    Stream the national XYZ file into the clipped, thresholded output (file3.csv).
+    Each chunk goes through a bounding-box prefilter, the region clip and the density
+    threshold, and is appended to dst_path straight away, so memory is bounded by chunk_rows.
+    Args:
+        src_path: WorldPop XYZ CSV (e.g. pak_pd_2020_1km_ASCII_XYZ.csv)
+        dst_path: Output CSV, same layout as file3.csv (original row number as first column)
+        region: PolygonIndex of the boundary, used for the bounding box and point clipping
+        density_threshold: Keep cells with density strictly above this value
+        chunk_rows: Rows per chunk, the main memory knob
+        raster_mask, grid: Optional rasterized region mask and its GridTransform, replaces the
+            point clip with a per-cell lookup
+        progress: Optional callable receiving the running stats dict after every chunk
+    Returns:
+        dict: rows_read, rows_written, seconds and rows_per_sec
+    """
+    min_lon, min_lat, max_lon, max_lat = region.bbox
+    stats = {'rows_read': 0, 'rows_written': 0, 'seconds': 0.0, 'rows_per_sec': 0.0}
+    start = time.perf_counter()
+    tmp_path = f"{dst_path}.partial"
+    header = True
+    with open(tmp_path, 'w', newline='') as out:
+        for chunk in read_xyz_chunks(src_path, chunk_rows):
+            stats['rows_read'] += len(chunk)
+            lons = chunk['Longitude'].to_numpy()
+            lats = chunk['Latitude'].to_numpy()
+            density = chunk['Population Density at 1km'].to_numpy()
+            # Cheap filters first, the geometric test only runs on what is left
+            keep = ((density > density_threshold) &
+                    (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat))
+            candidates = np.flatnonzero(keep)
+            if raster_mask is not None:
+                rows, cols, valid = cell_indices(grid, lons[candidates], lats[candidates])
+                inside = np.zeros(len(candidates), dtype=bool)
+                inside[valid] = raster_mask[rows[valid], cols[valid]]
+            else:
+                inside = region.contains(lons[candidates], lats[candidates])
+            selected = chunk.iloc[candidates[inside]]
+            if len(selected):
+                selected.to_csv(out, header=header)
+                header = False
+                stats['rows_written'] += len(selected)
+            stats['seconds'] = time.perf_counter() - start
+            stats['rows_per_sec'] = stats['rows_read'] / stats['seconds'] if stats['seconds'] else 0.0
+            if progress is not None:
+                progress(dict(stats))
+        if header:
+            # No rows passed the filters: still write the header so readers get the columns
+            pd.DataFrame(columns=list(XYZ_COLUMNS.values())).to_csv(out)
+    os.replace(tmp_path, dst_path)
+    return stats
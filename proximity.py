@@ -0,0 +1,207 @@
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+from geo_distance import EARTH_RADIUS_KM, haversine_km
+
+KM_PER_DEGREE = 111.2  # Same factor as the bounding box in has_nearby_high_school
+
+
+def unit_sphere_coordinates(lats, lngs):
+    """Convert latitude/longitude arrays (degrees) to 3D points on the unit sphere."""
+    lat_rad = np.radians(np.asarray(lats, dtype=np.float64))
+    lng_rad = np.radians(np.asarray(lngs, dtype=np.float64))
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack((cos_lat * np.cos(lng_rad),
+                            cos_lat * np.sin(lng_rad),
+                            np.sin(lat_rad)))
+
+
+def chord_length(radius_km):
+    """Straight-line distance on the unit sphere for a great-circle distance in km."""
+    angle = min(radius_km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+def is_point_in_box(test_lat, test_lon, min_lat, min_lon, max_lat, max_lon):
+    """Checks if a point is inside a bounding box."""
+    return (min_lat <= test_lat <= max_lat) and (min_lon <= test_lon <= max_lon)
+
+def haversine_distance(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points, with math for plain floats (one pair at a time)."""
+    lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = (math.sin(dlat / 2) ** 2 +
+         math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2)
+    c = 2 * math.asin(math.sqrt(min(a, 1.0)))
+    return c * EARTH_RADIUS_KM
+
+def has_nearby_high_school(middle_school_lat, middle_school_lon, high_schools_list, radius_km):
+    """
+    Check if there are any high schools within the given radius of a middle school.
+    Scalar reference scan; HighSchoolIndex.any_within gives the same answer for many schools at once.
+    Returns:
+        bool: True if at least one high school is found within the radius, False otherwise
+    """
+    #Calculate bounding box around the middle school for fast filtering
+    delta_lat = radius_km / KM_PER_DEGREE
+    lat_rad = math.radians(middle_school_lat)
+    delta_lon = radius_km / (KM_PER_DEGREE * math.cos(lat_rad))
+
+    min_lat = middle_school_lat - delta_lat
+    max_lat = middle_school_lat + delta_lat
+    min_lon = middle_school_lon - delta_lon
+    max_lon = middle_school_lon + delta_lon
+
+    # Check each high school
+    for high_school in high_schools_list:
+        hs_lat, hs_lon = high_school['lat'], high_school['lng']
+
+        # Fast bounding box check first
+        if is_point_in_box(hs_lat, hs_lon, min_lat, min_lon, max_lat, max_lon):
+            # Precise distance calculation
+            distance = haversine_distance(middle_school_lat, middle_school_lon, hs_lat, hs_lon)
+            if distance <= radius_km:
+                return True  # Found at least one high school within radius
+    return False  #No high schools found within radius
+
+
+class HighSchoolIndex:
+    """
+    KD-tree over high school locations on the unit sphere, built once and queried in batches.
+    Chord distance on the unit sphere grows monotonically with great-circle distance, so a
+    ball query gives every high school that can possibly be within the radius. Candidates are
+    then checked with the same bounding box and haversine rule as has_nearby_high_school.
+    """
+
+    def __init__(self, lats, lngs):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self._tree = cKDTree(unit_sphere_coordinates(self.lats, self.lngs)) if len(self.lats) else None
+
+    @classmethod
+    def from_list(cls, high_schools_list):
+        """Build the index from the list of {'lat', 'lng', ...} dictionaries used by the app."""
+        lats = [high_school['lat'] for high_school in high_schools_list]
+        lngs = [high_school['lng'] for high_school in high_schools_list]
+        return cls(lats, lngs)
+
+    def __len__(self):
+        return len(self.lats)
+
+    def candidate_pairs(self, lats, lngs, radius_km):
+        """
+        Find (query, high school) index pairs that pass the bounding box and haversine checks.
+        Args:
+            lats, lngs: Arrays of query coordinates (e.g. middle schools)
+            radius_km: Search radius in kilometers
+        Returns:
+            tuple: (query_idx, high_idx, distance_km) arrays, one entry per matching pair
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        if self._tree is None or len(lats) == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty, np.empty(0, dtype=np.float64)
+
+        # A small slack on the chord keeps boundary cases for the exact check below
+        search_radius = chord_length(radius_km) * (1 + 1e-9) + 1e-12
+        candidates = self._tree.query_ball_point(unit_sphere_coordinates(lats, lngs), search_radius,
+                                                 return_sorted=False)
+        counts = np.fromiter((len(c) for c in candidates), dtype=np.intp, count=len(candidates))
+        if counts.sum() == 0:
+            empty = np.empty(0, dtype=np.intp)
+            return empty, empty, np.empty(0, dtype=np.float64)
+        query_idx = np.repeat(np.arange(len(lats)), counts)
+        high_idx = np.concatenate([c for c in candidates if c]).astype(np.intp)
+
+        q_lat, q_lng = lats[query_idx], lngs[query_idx]
+        h_lat, h_lng = self.lats[high_idx], self.lngs[high_idx]
+
+        # Same bounding box as has_nearby_high_school, built around each query point
+        delta_lat = radius_km / KM_PER_DEGREE
+        delta_lon = radius_km / (KM_PER_DEGREE * np.cos(np.radians(q_lat)))
+        in_box = ((q_lat - delta_lat <= h_lat) & (h_lat <= q_lat + delta_lat) &
+                  (q_lng - delta_lon <= h_lng) & (h_lng <= q_lng + delta_lon))
+
+        distance = haversine_km(q_lat, q_lng, h_lat, h_lng)
+        keep = in_box & (distance <= radius_km)
+        return query_idx[keep], high_idx[keep], distance[keep]
+
+    def nearest(self, lats, lngs):
+        """
+        Nearest high school for every query point.
+        Returns:
+            tuple: (high_idx, distance_km) arrays; distance is inf and index -1 when the index is empty
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        if self._tree is None or len(lats) == 0:
+            return np.full(len(lats), -1, dtype=np.intp), np.full(len(lats), np.inf)
+        # The nearest point by chord is also the nearest by great-circle distance
+        _, high_idx = self._tree.query(unit_sphere_coordinates(lats, lngs), k=1)
+        high_idx = np.asarray(high_idx, dtype=np.intp)
+        return high_idx, haversine_km(lats, lngs, self.lats[high_idx], self.lngs[high_idx])
+
+    def nearest_distance(self, lats, lngs):
+        """Great-circle distance in km from every query point to its nearest high school."""
+        return self.nearest(lats, lngs)[1]
+
+    def _box_distance(self, q_lat, q_lng, high_idx, distance_km):
+        """Smallest radius whose bounding box around each query point contains its high school."""
+        h_lat, h_lng = self.lats[high_idx], self.lngs[high_idx]
+        return np.maximum(distance_km, np.maximum(
+            np.abs(h_lat - q_lat) * KM_PER_DEGREE,
+            np.abs(h_lng - q_lng) * KM_PER_DEGREE * np.cos(np.radians(q_lat))))
+
+    def admitting_radius(self, lats, lngs, chunk_size=4096):
+        """
+        Smallest radius at which has_nearby_high_school turns True for every query point.
+        A high school passes the check once the radius reaches both its haversine distance and
+        its offset in the degree bounding box, so this is the minimum over high schools of the
+        larger of the two; it is never below the nearest distance and differs from it only
+        where the box is tighter than the circle (by up to a few metres).
+        Returns:
+            np.ndarray: Radius in km per query point, inf when the index is empty
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        high_idx, distance = self.nearest(lats, lngs)
+        if self._tree is None or len(lats) == 0:
+            return distance
+        # The nearest high school bounds the answer; any school that beats it is within that distance
+        radius = self._box_distance(lats, lngs, high_idx, distance)
+        for start in range(0, len(lats), chunk_size):
+            stop = min(start + chunk_size, len(lats))
+            angle = np.minimum(radius[start:stop] / EARTH_RADIUS_KM, np.pi)
+            candidates = self._tree.query_ball_point(unit_sphere_coordinates(lats[start:stop], lngs[start:stop]),
+                                                     2 * np.sin(angle / 2) * (1 + 1e-9) + 1e-12,
+                                                     return_sorted=False)
+            counts = np.fromiter((len(c) for c in candidates), dtype=np.intp, count=len(candidates))
+            if counts.sum() == 0:
+                continue
+            query_idx = start + np.repeat(np.arange(stop - start), counts)
+            cand_idx = np.concatenate([c for c in candidates if c]).astype(np.intp)
+            q_lat, q_lng = lats[query_idx], lngs[query_idx]
+            cand_distance = haversine_km(q_lat, q_lng, self.lats[cand_idx], self.lngs[cand_idx])
+            np.minimum.at(radius, query_idx, self._box_distance(q_lat, q_lng, cand_idx, cand_distance))
+        return radius
+
+    def any_within(self, lats, lngs, radius_km, chunk_size=4096):
+        """
+        Batch version of has_nearby_high_school.
+        Args:
+            lats, lngs: Arrays of middle school coordinates
+            radius_km: Search radius in kilometers
+            chunk_size: Number of query points per KD-tree call, bounds candidate memory
+        Returns:
+            np.ndarray: Boolean array, True where at least one high school is within the radius
+        """
+        lats = np.asarray(lats, dtype=np.float64)
+        lngs = np.asarray(lngs, dtype=np.float64)
+        result = np.zeros(len(lats), dtype=bool)
+        for start in range(0, len(lats), chunk_size):
+            stop = start + chunk_size
+            query_idx, _, _ = self.candidate_pairs(lats[start:stop], lngs[start:stop], radius_km)
+            result[start + query_idx] = True
+        return result
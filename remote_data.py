@@ -0,0 +1,109 @@
+import hashlib
+import json
+import os
+import time
+import pandas as pd
+import requests
+import urllib3
+from data_cache import atomic_path
+
+HTTP_CACHE_DIR = os.path.join('.cache', 'http')
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class _TeeReader:
+    """File-like wrapper that copies every block the parser reads into a sink file."""
+
+    def __init__(self, raw, sink):
+        self.raw = raw
+        self.sink = sink
+
+    def read(self, size=-1):
+        data = self.raw.read(None if size is None or size < 0 else size, decode_content=True)
+        self.sink.write(data)
+        return data
+
+
+def _cache_paths(url, cache_dir):
+    key = hashlib.sha1(url.encode()).hexdigest()
+    return os.path.join(cache_dir, f"{key}.body"), os.path.join(cache_dir, f"{key}.json")
+
+
+def fetch_csv(url, headers=None, cache_dir=HTTP_CACHE_DIR, retries=3, backoff=0.5, timeout=30,
+              session=None, **read_csv_kwargs):
+    """
+    Download a CSV with a disk cache and conditional requests.
+    The cached payload's ETag / Last-Modified are sent as If-None-Match / If-Modified-Since;
+    a 304 reuses the file on disk. A 200 response is streamed straight into pd.read_csv while
+    being copied to the cache. Connection errors, bodies cut short and 429/5xx responses are
+    retried with exponential backoff; if every attempt fails, a cached copy is returned when
+    there is one.
+    Args:
+        url: CSV location
+        headers: Extra request headers (e.g. Authorization)
+        cache_dir: Directory holding one payload and one metadata file per URL
+        retries: Attempts after the first one
+        backoff: Base delay in seconds, doubled on every retry
+        timeout: Per-request timeout in seconds
+        session: Optional requests.Session, e.g. to reuse connections
+        read_csv_kwargs: Passed to pd.read_csv
+    Returns:
+        DataFrame: Parsed CSV
+    """
+    body_path, meta_path = _cache_paths(url, cache_dir)
+    meta = {}
+    # Validators are only sent when there is a body on disk to reuse on a 304
+    if os.path.exists(body_path) and os.path.exists(meta_path):
+        with open(meta_path) as f:
+            meta = json.load(f)
+
+    request_headers = dict(headers or {})
+    if meta.get('etag'):
+        request_headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        request_headers['If-Modified-Since'] = meta['last_modified']
+
+    http = session or requests
+    error = None
+    for attempt in range(retries + 1):
+        if attempt:
+            time.sleep(backoff * 2 ** (attempt - 1))
+        try:
+            with http.get(url, headers=request_headers, stream=True, timeout=timeout) as response:
+                if response.status_code == 304 and meta:
+                    return pd.read_csv(body_path, **read_csv_kwargs)
+                if response.status_code in RETRY_STATUS:
+                    error = requests.HTTPError(f"{response.status_code} for {url}", response=response)
+                    continue
+                response.raise_for_status()
+                return _parse_and_store(response, url, body_path, meta_path, read_csv_kwargs)
+        except requests.HTTPError:
+            # Non-retryable status (e.g. 404)
+            raise
+        except (requests.RequestException, urllib3.exceptions.HTTPError,
+                pd.errors.ParserError, pd.errors.EmptyDataError) as e:
+            # Connection failures and bodies cut short while streaming into the parser
+            error = e
+
+    if meta and os.path.exists(body_path):
+        # Serve the last good copy rather than failing the app
+        return pd.read_csv(body_path, **read_csv_kwargs)
+    raise error
+
+
+def _parse_and_store(response, url, body_path, meta_path, read_csv_kwargs):
+    os.makedirs(os.path.dirname(body_path), exist_ok=True)
+    with atomic_path(body_path) as tmp_path, open(tmp_path, 'wb') as sink:
+        df = pd.read_csv(_TeeReader(response.raw, sink), **read_csv_kwargs)
+        # The parser may stop before end of stream (e.g. nrows); keep the cached copy complete
+        for block in iter(lambda: response.raw.read(1 << 16, decode_content=True), b''):
+            sink.write(block)
+    meta = {
+        'url': url,
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+        'fetched_at': time.time(),
+    }
+    with atomic_path(meta_path) as tmp_meta_path, open(tmp_meta_path, 'w') as f:
+        json.dump(meta, f, indent=2)
+    return df
@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from data_cache import atomic_path, data_version
+from geo_distance import haversine_km
+from proximity import HighSchoolIndex
+
+ROAD_CACHE_DIR = os.path.join('.cache', 'roads')
+COORDINATE_SCALE = 10_000_000  # OSM stores coordinates to 1e-7 degrees; vertices closer than that are one node
+
+# OSM highway values that carry traffic to schools; footways and service roads are left out
+ROAD_TYPES = {
+    'motorway', 'motorway_link', 'trunk', 'trunk_link', 'primary', 'primary_link',
+    'secondary', 'secondary_link', 'tertiary', 'tertiary_link', 'unclassified',
+    'residential', 'living_street', 'road', 'track',
+}
+
+
+class RoadGraph:
+    """
+    Undirected road network as a compact CSR graph with edge lengths in km.
+    Node i is at (lats[i], lngs[i]); its edges are indices/weights[indptr[i]:indptr[i + 1]].
+    """
+
+    def __init__(self, lats, lngs, indptr, indices, weights):
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lngs = np.asarray(lngs, dtype=np.float64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self._node_index = None
+
+    def __len__(self):
+        return len(self.lats)
+
+    @classmethod
+    def from_lines(cls, lines):
+        """
+        Build the graph from road polylines.
+        Args:
+            lines: Iterable of (n, 2) arrays of (lon, lat) vertices, one per road segment
+        Returns:
+            RoadGraph: Shared vertices merged into one node, parallel edges reduced to the shortest
+        """
+        lines = [np.asarray(line, dtype=np.float64) for line in lines if len(line) >= 2]
+        if not lines:
+            return cls([], [], np.zeros(1, dtype=np.int64), [], [])
+        coords = np.concatenate(lines)
+        line_end = np.cumsum([len(line) for line in lines]) - 1
+
+        keys = np.rint(coords * COORDINATE_SCALE).astype(np.int64)
+        unique_keys, node = np.unique(keys, axis=0, return_inverse=True)
+        node = node.ravel()
+        lngs, lats = unique_keys[:, 0] / COORDINATE_SCALE, unique_keys[:, 1] / COORDINATE_SCALE
+
+        # Consecutive vertices of the same line form an edge
+        is_edge = np.ones(len(coords) - 1, dtype=bool)
+        is_edge[line_end[:-1]] = False
+        start, stop = node[:-1][is_edge], node[1:][is_edge]
+        keep = start != stop
+        start, stop = start[keep], stop[keep]
+        length = haversine_km(lats[start], lngs[start], lats[stop], lngs[stop])
+
+        # Both directions, then the shortest of any parallel edges
+        source = np.concatenate([start, stop])
+        target = np.concatenate([stop, start])
+        length = np.concatenate([length, length])
+        order = np.lexsort((length, target, source))
+        source, target, length = source[order], target[order], length[order]
+        first = np.ones(len(source), dtype=bool)
+        first[1:] = (source[1:] != source[:-1]) | (target[1:] != target[:-1])
+        source, target, length = source[first], target[first], length[first]
+
+        indptr = np.concatenate([[0], np.cumsum(np.bincount(source, minlength=len(lats)))])
+        return cls(lats, lngs, indptr, target, length)
+
+    def to_csgraph(self):
+        """The graph as a scipy sparse matrix for scipy.sparse.csgraph."""
+        return csr_matrix((self.weights, self.indices, self.indptr), shape=(len(self), len(self)))
+
+    def snap(self, lats, lngs):
+        """
+        Nearest graph node of every point.
+        Returns:
+            tuple: (node, distance_km) arrays; node is -1 and distance inf for an empty graph
+        """
+        if self._node_index is None:
+            self._node_index = HighSchoolIndex(self.lats, self.lngs)
+        return self._node_index.nearest(lats, lngs)
+
+    def distances_from(self, lats, lngs, limit_km=np.inf):
+        """
+        Travel distance in km from the nearest of a set of points (e.g. all high schools) to every node.
+        One Dijkstra run from a virtual source linked to the snapped node of every point, with the
+        snap distance as the link length, so the walk to the road network is included.
+        Args:
+            lats, lngs: Source points
+            limit_km: Nodes farther than this are left at inf, which cuts the search short
+        Returns:
+            ndarray: Distance per node, inf where no source is reachable
+        """
+        nodes, snap_km = self.snap(lats, lngs)
+        valid = nodes >= 0
+        if not valid.any():
+            return np.full(len(self), np.inf)
+        # Shortest link per node when several sources snap to the same one
+        link = np.full(len(self), np.inf)
+        np.minimum.at(link, nodes[valid], snap_km[valid])
+        linked = np.flatnonzero(np.isfinite(link))
+
+        n = len(self)
+        indptr = np.concatenate([self.indptr, [self.indptr[-1] + len(linked)]])
+        indices = np.concatenate([self.indices, linked])
+        # csgraph treats explicit zeros as missing edges, so a school exactly on a node gets a tiny length
+        weights = np.concatenate([self.weights, np.maximum(link[linked], 1e-12)])
+        graph = csr_matrix((weights, indices, indptr), shape=(n + 1, n + 1))
+        return dijkstra(graph, directed=True, indices=n, limit=limit_km)[:n]
+
+    def travel_distance(self, source_lats, source_lngs, lats, lngs, limit_km=np.inf):
+        """
+        Road travel distance in km from every point to its nearest source point, including the
+        straight-line walks between each point and its snapped node. inf where disconnected.
+        """
+        node_distance = self.distances_from(source_lats, source_lngs, limit_km)
+        nodes, snap_km = self.snap(lats, lngs)
+        distance = np.full(len(nodes), np.inf)
+        valid = nodes >= 0
+        distance[valid] = node_distance[nodes[valid]] + snap_km[valid]
+        return distance
+
+    def save(self, path, source=None):
+        with atomic_path(path) as tmp_path, open(tmp_path, 'wb') as f:
+            np.savez(f, lats=self.lats, lngs=self.lngs, indptr=self.indptr, indices=self.indices,
+                     weights=self.weights, source=json.dumps(source))
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved graph; returns (graph, source recorded by save)."""
+        with np.load(path) as data:
+            graph = cls(data['lats'], data['lngs'], data['indptr'], data['indices'], data['weights'])
+            source = json.loads(str(data['source']))
+        return graph, source
+
+
+def geojson_lines(path, road_types=ROAD_TYPES):
+    """
+    Road polylines of a GeoJSON extract (e.g. exported with osmium or ogr2ogr).
+    Features with a 'highway' property are kept when it is in road_types; features without one
+    are kept as they are. road_types=None keeps every LineString and MultiLineString.
+    """
+    with open(path) as f:
+        collection = json.load(f)
+    for feature in collection.get('features', []):
+        geometry = feature.get('geometry') or {}
+        highway = (feature.get('properties') or {}).get('highway')
+        if road_types is not None and highway is not None and highway not in road_types:
+            continue
+        if geometry.get('type') == 'LineString':
+            yield geometry['coordinates']
+        elif geometry.get('type') == 'MultiLineString':
+            yield from geometry['coordinates']
+
+
+def pbf_lines(path, road_types=ROAD_TYPES):
+    """Road polylines of an OSM PBF extract; needs the optional pyosmium package."""
+    try:
+        import osmium
+    except ImportError as error:
+        raise ImportError("Reading .osm.pbf road extracts needs pyosmium (pip install osmium); "
+                          "a GeoJSON export of the same extract works without it") from error
+
+    lines = []
+
+    class RoadHandler(osmium.SimpleHandler):
+        def way(self, way):
+            highway = way.tags.get('highway')
+            if highway is None or (road_types is not None and highway not in road_types):
+                return
+            coords = [(n.lon, n.lat) for n in way.nodes if n.location.valid()]
+            if len(coords) >= 2:
+                lines.append(coords)
+
+    RoadHandler().apply_file(path, locations=True)
+    return lines
+
+
+def read_road_lines(path, road_types=ROAD_TYPES):
+    """Road polylines of a .osm.pbf / .pbf or .geojson / .json extract."""
+    if path.endswith('.pbf'):
+        return pbf_lines(path, road_types)
+    return list(geojson_lines(path, road_types))
+
+
+def load_road_graph(path, cache_dir=ROAD_CACHE_DIR, road_types=ROAD_TYPES):
+    """
+    Road graph of a local OSM extract, compiled once and cached as a .npz next to the other caches.
+    The cache is rebuilt when the extract's mtime or size changes; no network access is needed.
+    """
+    abs_path = os.path.abspath(path)
+    name = os.path.basename(abs_path).split('.')[0]
+    key = hashlib.sha1(abs_path.encode()).hexdigest()[:12]
+    cache_path = os.path.join(cache_dir, f"{name}-{key}.npz")
+    source = {'version': [list(v) for v in data_version(path)],
+              'road_types': sorted(road_types) if road_types is not None else None}
+
+    if os.path.exists(cache_path):
+        graph, cached_source = RoadGraph.load(cache_path)
+        if cached_source == source:
+            return graph
+
+    graph = RoadGraph.from_lines(read_road_lines(path, road_types))
+    os.makedirs(cache_dir, exist_ok=True)
+    graph.save(cache_path, source)
+    return graph
@@ -0,0 +1,147 @@
+import json
+import numpy as np
+from branca.element import MacroElement
+from folium.elements import JSCSSMixin
+from folium.plugins import MarkerCluster
+from jinja2 import Template
+
+
+def school_feature_collection(schools, classes, properties, lat_col='Lat', lng_col='Lng'):
+    """
+    One GeoJSON FeatureCollection for all schools.
+    Args:
+        schools: School DataFrame
+        classes: Array or Series with the style class of every school (e.g. classification status)
+        properties: Mapping of feature property name -> column of schools
+        lat_col, lng_col: Coordinate columns
+    Returns:
+        dict: FeatureCollection with the class stored in the 'c' property
+    """
+    lats = np.round(schools[lat_col].to_numpy(dtype=np.float64), 6).tolist()
+    lngs = np.round(schools[lng_col].to_numpy(dtype=np.float64), 6).tolist()
+    columns = {name: _json_values(schools[column]) for name, column in properties.items()}
+    columns['c'] = list(np.asarray(classes).tolist())
+    names = list(columns)
+    features = [
+        {'type': 'Feature',
+         'geometry': {'type': 'Point', 'coordinates': [lng, lat]},
+         'properties': dict(zip(names, values))}
+        for lat, lng, *values in zip(lats, lngs, *columns.values())
+    ]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def _json_values(series):
+    # Missing values become null; numpy scalars become plain Python numbers
+    values = series.astype(object).where(series.notna(), None).tolist()
+    return [value.item() if isinstance(value, np.generic) else value for value in values]
+
+
+class SchoolLayer(JSCSSMixin, MacroElement):
+    """
+    All schools as a single clustered GeoJSON layer, styled client-side by a class property.
+    The FeatureCollection is embedded once; Leaflet builds one circle marker per feature and
+    groups them with Leaflet.markercluster. Tooltips and popups are rendered in the browser
+    from the feature properties, so no per-school HTML is generated in Python. Without
+    popup_fields no popup is bound, for apps that show details from st_folium's last_object_clicked.
+    Features with an 'n' property are aggregates of n schools and are drawn as one larger circle.
+    """
+
+    _template = Template(u"""
+        {% macro script(this, kwargs) %}
+            {%- if this.cluster %}
+            var {{ this.get_name() }} = L.markerClusterGroup({{ this.cluster_options }});
+            {%- else %}
+            var {{ this.get_name() }} = L.featureGroup();
+            {%- endif %}
+            (function() {
+                var styles = {{ this.styles }};
+                var popupFields = {{ this.popup_fields }};
+                var esc = function(value) {
+                    return String(value === null || value === undefined ? 'N/A' : value)
+                        .replace(/&/g, '&amp;').replace(/</g, '&lt;').replace(/>/g, '&gt;');
+                };
+                L.geoJson({{ this.data }}, {
+                    pointToLayer: function(feature, latlng) {
+                        var p = feature.properties;
+                        var style = styles[p.c] || styles['Other'];
+                        if (p.n !== undefined) {
+                            // Aggregate of p.n schools of one class (see viewport.aggregate_points)
+                            var aggregate = L.circleMarker(latlng, {
+                                radius: Math.min({{ this.radius }} + 2 * Math.sqrt(p.n), 30),
+                                weight: 2, opacity: 1, fillOpacity: 0.6,
+                                fillColor: style[0], color: style[1]
+                            });
+                            aggregate.bindTooltip(p.n + ' x ' + esc(p.c) + ' (zoom in for individual schools)');
+                            return aggregate;
+                        }
+                        var marker = L.circleMarker(latlng, {
+                            radius: {{ this.radius }}, weight: 2, opacity: 1, fillOpacity: 0.7,
+                            fillColor: style[0], color: style[1]
+                        });
+                        var tooltip = esc(p.{{ this.level_property }}) + ' School: ' + esc(p.{{ this.name_property }});
+                        {%- if this.enrollment_property %}
+                        if (p.{{ this.enrollment_property }} !== null) {
+                            tooltip += ' (Enrollment: ' + esc(p.{{ this.enrollment_property }}) + ')';
+                        }
+                        {%- endif %}
+                        marker.bindTooltip(tooltip);
+                        {%- if this.popup_fields != 'null' %}
+                        marker.bindPopup(function() {
+                            var rows = popupFields.map(function(field) {
+                                return '<tr><td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">'
+                                    + esc(field[0]) + ':</td><td style="padding: 5px; border-bottom: 1px solid #eee;">'
+                                    + esc(p[field[1]]) + '</td></tr>';
+                            }).join('');
+                            {%- if this.show_coordinates %}
+                            rows += '<tr><td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Latitude:</td>'
+                                + '<td style="padding: 5px; border-bottom: 1px solid #eee;">' + latlng.lat.toFixed(6) + '</td></tr>'
+                                + '<tr><td style="padding: 5px; border-bottom: 1px solid #eee; font-weight: bold;">Longitude:</td>'
+                                + '<td style="padding: 5px; border-bottom: 1px solid #eee;">' + latlng.lng.toFixed(6) + '</td></tr>';
+                            {%- endif %}
+                            return '<div style="font-family: Arial, sans-serif; max-width: 300px;">'
+                                + '<h3 style="margin: 0 0 10px 0; color: #0078D7;">' + esc(p.{{ this.name_property }}) + '</h3>'
+                                + '<table style="width: 100%; border-collapse: collapse;">' + rows + '</table></div>';
+                        }, {maxWidth: 350});
+                        {%- endif %}
+                        return marker;
+                    }
+                }).addTo({{ this.get_name() }});
+            })();
+            {{ this.get_name() }}.addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """)
+
+    default_js = MarkerCluster.default_js
+    default_css = MarkerCluster.default_css
+
+    def __init__(self, feature_collection, styles, popup_fields=None, name_property='name',
+                 level_property='level', enrollment_property=None, show_coordinates=True, radius=6,
+                 disable_clustering_at_zoom=13, cluster=True):
+        """
+        Args:
+            feature_collection: Output of school_feature_collection
+            styles: Mapping of class -> (fill_color, border_color); an 'Other' entry is the fallback
+            popup_fields: (label, property) pairs shown in the popup table; None for no popup
+            name_property, level_property, enrollment_property: Properties used in the tooltip
+            show_coordinates: Add Latitude/Longitude rows to the popup, taken from the marker position
+            radius: Marker radius in pixels
+            disable_clustering_at_zoom: Zoom from which every school is drawn individually
+            cluster: Group markers with Leaflet.markercluster; off for pre-aggregated features
+        """
+        super().__init__()
+        self._name = 'SchoolLayer'
+        # Compact JSON; "</" is escaped so names can never close the surrounding script tag
+        self.data = json.dumps(feature_collection, separators=(',', ':')).replace('</', '<\\/')
+        self.styles = json.dumps({k: list(v) for k, v in styles.items()})
+        self.popup_fields = json.dumps(None if popup_fields is None else [list(field) for field in popup_fields])
+        self.name_property = name_property
+        self.level_property = level_property
+        self.enrollment_property = enrollment_property
+        self.show_coordinates = show_coordinates
+        self.radius = radius
+        self.cluster = cluster
+        self.cluster_options = json.dumps({
+            'disableClusteringAtZoom': disable_clustering_at_zoom,
+            'chunkedLoading': True,
+        })
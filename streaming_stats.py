@@ -0,0 +1,163 @@
+import math
+import numpy as np
+from population_ingest import XYZ_COLUMNS, read_xyz_chunks
+
+DENSITY_COLUMN = XYZ_COLUMNS['Z']
+
+
+class QuantileSketch:
+    """
+    Mergeable quantile sketch with relative-error guarantees (the DDSketch scheme).
+    Values are counted in logarithmic buckets of ratio gamma = (1 + a) / (1 - a), where a is
+    relative_accuracy. Any quantile it returns is within a * |x| of the true value x at that
+    rank, for every input size and order. Memory grows with log(max / min) / log(gamma),
+    not with the number of values (about 2,100 buckets for a = 0.005 over nine decades).
+    Merging two sketches adds their bucket counts, so the result does not depend on how the
+    data was split.
+    """
+
+    def __init__(self, relative_accuracy=0.005, min_value=1e-9):
+        """
+        Args:
+            relative_accuracy: Relative error bound a of every returned quantile
+            min_value: Magnitudes below this are counted as zero
+        """
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.positive = {}  # Bucket key -> count
+        self.negative = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def _add(self, store, magnitudes):
+        keys, counts = np.unique(np.ceil(np.log(magnitudes) / self.log_gamma).astype(np.int64), return_counts=True)
+        for key, count in zip(keys.tolist(), counts.tolist()):
+            store[key] = store.get(key, 0) + count
+
+    def update(self, values):
+        """Add an array of values (NaN must be removed by the caller)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        small = np.abs(values) < self.min_value
+        self.zero_count += int(np.count_nonzero(small))
+        self._add(self.positive, values[~small & (values > 0)])
+        self._add(self.negative, -values[~small & (values < 0)])
+        self.count += len(values)
+        return self
+
+    def merge(self, other):
+        """Add the counts of another sketch with the same relative_accuracy."""
+        if other.gamma != self.gamma or other.min_value != self.min_value:
+            raise ValueError("Can only merge sketches with the same relative_accuracy and min_value")
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for key, count in other_store.items():
+                store[key] = store.get(key, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        return self
+
+    def _value(self, key):
+        # Midpoint (in relative terms) of bucket (gamma^(key-1), gamma^key]
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    def quantile(self, q):
+        """Value at rank q * (count - 1), NaN for an empty sketch."""
+        if not self.count:
+            return float('nan')
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+
+class StreamingStats:
+    """
+    Single-pass count, min, max, mean, standard deviation and quantiles over chunks of values.
+    Mean and variance use Welford's update applied per chunk (Chan et al.'s parallel form), so
+    chunk or district partials combine exactly with merge(). Quantiles come from a QuantileSketch.
+    NaN values are skipped.
+    """
+
+    def __init__(self, relative_accuracy=0.005):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0  # Sum of squared deviations from the mean
+        self.min = math.inf
+        self.max = -math.inf
+        self.sketch = QuantileSketch(relative_accuracy)
+
+    def _combine(self, count, mean, m2, minimum, maximum):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+        self.min = min(self.min, minimum)
+        self.max = max(self.max, maximum)
+
+    def update(self, values):
+        """Add one chunk of values."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values):
+            mean = values.mean()
+            self._combine(len(values), mean, float(np.square(values - mean).sum()), values.min(), values.max())
+            self.sketch.update(values)
+        return self
+
+    def merge(self, other):
+        """Fold in the statistics of another accumulator, e.g. from another chunk or district."""
+        if other.count:
+            self._combine(other.count, other.mean, other.m2, other.min, other.max)
+            self.sketch.merge(other.sketch)
+        return self
+
+    def variance(self, ddof=1):
+        return self.m2 / (self.count - ddof) if self.count > ddof else float('nan')
+
+    def std(self, ddof=1):
+        return math.sqrt(self.variance(ddof))
+
+    def quantile(self, q):
+        return self.sketch.quantile(q)
+
+    def summary(self):
+        """The apps' stats dict: exact max/min/mean/std (ddof=1) and count, sketch quantiles."""
+        return {
+            'max': self.max,
+            'min': self.min,
+            'mean': self.mean,
+            'median': self.quantile(0.5),
+            'std': self.std(),
+            'total_points': self.count,
+            'q25': self.quantile(0.25),
+            'q75': self.quantile(0.75),
+            'q90': self.quantile(0.90),
+        }
+
+
+def array_stats(values, block_rows=1024, relative_accuracy=0.005):
+    """StreamingStats over a 2D array (e.g. a memory-mapped DensityRaster) in blocks of rows."""
+    stats = StreamingStats(relative_accuracy)
+    for start in range(0, len(values), block_rows):
+        stats.update(values[start:start + block_rows])
+    return stats
+
+
+def csv_stats(path, chunk_rows=500_000, relative_accuracy=0.005):
+    """StreamingStats of the density column of an XYZ / file3.csv population file, read in chunks."""
+    stats = StreamingStats(relative_accuracy)
+    for chunk in read_xyz_chunks(path, chunk_rows):
+        stats.update(chunk[DENSITY_COLUMN].to_numpy())
+    return stats
@@ -0,0 +1,117 @@
+import heapq
+import numpy as np
+import pandas as pd
+from proximity import HighSchoolIndex
+
+
+def coverage_sets(cand_lats, cand_lngs, target_lats, target_lngs, radius_km, chunk_size=4096):
+    """
+    Targets within radius_km of every candidate, as CSR arrays from a spatial index query.
+    Returns:
+        tuple: (offsets, members); the targets covered by candidate i are members[offsets[i]:offsets[i + 1]]
+    """
+    cand_lats = np.asarray(cand_lats, dtype=np.float64)
+    cand_lngs = np.asarray(cand_lngs, dtype=np.float64)
+    index = HighSchoolIndex(target_lats, target_lngs)
+    pair_cands, pair_targets = [], []
+    for start in range(0, len(cand_lats), chunk_size):
+        stop = start + chunk_size
+        query_idx, target_idx, _ = index.candidate_pairs(cand_lats[start:stop], cand_lngs[start:stop], radius_km)
+        pair_cands.append(start + query_idx)
+        pair_targets.append(target_idx)
+    pair_cands = np.concatenate(pair_cands) if pair_cands else np.empty(0, dtype=np.intp)
+    pair_targets = np.concatenate(pair_targets) if pair_targets else np.empty(0, dtype=np.intp)
+    order = np.argsort(pair_cands, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(pair_cands, minlength=len(cand_lats)))])
+    return offsets, pair_targets[order]
+
+
+def lazy_greedy(offsets, members, weights, k):
+    """
+    Pick up to k candidates maximizing the total weight of covered targets (weighted max coverage).
+    Lazy greedy: cached gains sit in a max-heap and are only recomputed when they reach the top,
+    which is exact because coverage is submodular (a gain can only shrink as targets get covered).
+    Args:
+        offsets, members: Coverage sets from coverage_sets
+        weights: Weight of every target
+        k: Number of picks
+    Returns:
+        list: (candidate, gain, newly covered target count) per pick, in pick order; stops early
+        when no candidate adds coverage
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    covered = np.zeros(len(weights), dtype=bool)
+    # Initial gain of every candidate: the total weight of its set
+    cumulative = np.concatenate([[0.0], np.cumsum(weights[members])])
+    set_weight = cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+    heap = [(-gain, candidate) for candidate, gain in enumerate(set_weight.tolist()) if gain > 0]
+    heapq.heapify(heap)
+
+    picks = []
+    while heap and len(picks) < k:
+        _, candidate = heapq.heappop(heap)
+        targets = members[offsets[candidate]:offsets[candidate + 1]]
+        fresh = targets[~covered[targets]]
+        gain = float(weights[fresh].sum())
+        if gain <= 0:
+            continue
+        if heap and gain < -heap[0][0]:
+            # Stale: another candidate may now be better, push back with the updated gain
+            heapq.heappush(heap, (-gain, candidate))
+            continue
+        covered[fresh] = True
+        picks.append((candidate, gain, len(fresh)))
+    return picks
+
+
+def plan_upgrades(schools, school_table, k=10, weights='total_enrollment', radius_km=5.0, candidates='isolated'):
+    """
+    Middle schools to upgrade to high schools so that the most isolated enrollment (or population)
+    ends up within radius_km of a high school. An upgraded school covers every isolated school
+    within the radius, itself included, so each pick changes what the next one can add.
+    Args:
+        schools: School DataFrame with 'Lat', 'Lng' and the weight column
+        school_table: Classification of schools (classify_schools / ThresholdClassifier.classify)
+        k: Number of upgrades
+        weights: Column of schools or school_table, or an array aligned with schools, weighting
+            each isolated school (e.g. 'total_enrollment' or 'catchment_population')
+        radius_km: Coverage radius, normally the isolation radius used for school_table
+        candidates: 'isolated' to upgrade only isolated schools, 'middle' for any middle school
+    Returns:
+        DataFrame: One row per upgrade in pick order, indexed like schools, with rank, gain,
+        schools_covered, cumulative_gain and cumulative_share (of all isolated weight)
+    """
+    isolated = school_table['isolated'].to_numpy()
+    if candidates == 'isolated':
+        is_candidate = isolated
+    elif candidates == 'middle':
+        is_candidate = (schools['Level'] == "Middle").to_numpy()
+    else:
+        raise ValueError(f"candidates must be 'isolated' or 'middle', not {candidates!r}")
+
+    if isinstance(weights, str):
+        source = school_table if weights in school_table.columns else schools
+        weights = source[weights]
+    weights = np.nan_to_num(pd.to_numeric(pd.Series(np.asarray(weights)), errors='coerce').to_numpy(dtype=np.float64))
+    weights = np.clip(weights, 0, None)
+
+    lats = schools['Lat'].to_numpy(dtype=np.float64)
+    lngs = schools['Lng'].to_numpy(dtype=np.float64)
+    cand_pos = np.flatnonzero(is_candidate)
+    target_pos = np.flatnonzero(isolated)
+    offsets, members = coverage_sets(lats[cand_pos], lngs[cand_pos], lats[target_pos], lngs[target_pos], radius_km)
+    target_weights = weights[target_pos]
+    picks = lazy_greedy(offsets, members, target_weights, k)
+
+    plan = pd.DataFrame(
+        {
+            'rank': np.arange(1, len(picks) + 1),
+            'gain': [gain for _, gain, _ in picks],
+            'schools_covered': [count for _, _, count in picks],
+        },
+        index=schools.index[cand_pos[[candidate for candidate, _, _ in picks]]] if picks else schools.index[:0],
+    )
+    plan['cumulative_gain'] = plan['gain'].cumsum()
+    total = target_weights.sum()
+    plan['cumulative_share'] = plan['cumulative_gain'] / total if total > 0 else 0.0
+    return plan
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+from heatmap_pyramid import TILE_SIZE_PX
+
+
+def bounds_to_bbox(bounds, margin=0.25):
+    """
+    Bounding box (min_lon, min_lat, max_lon, max_lat) from the 'bounds' returned by st_folium,
+    grown by margin times its width/height on every side so small pans need no new data.
+    Returns None when the map has not reported its bounds yet.
+    """
+    if not bounds or not bounds.get('_southWest') or not bounds.get('_northEast'):
+        return None
+    south_west, north_east = bounds['_southWest'], bounds['_northEast']
+    if None in (south_west.get('lat'), south_west.get('lng'), north_east.get('lat'), north_east.get('lng')):
+        return None
+    min_lon, min_lat = south_west['lng'], south_west['lat']
+    max_lon, max_lat = north_east['lng'], north_east['lat']
+    pad_lon, pad_lat = (max_lon - min_lon) * margin, (max_lat - min_lat) * margin
+    return min_lon - pad_lon, min_lat - pad_lat, max_lon + pad_lon, max_lat + pad_lat
+
+
+def degrees_per_pixel(zoom):
+    """Longitude degrees covered by one screen pixel at a web map zoom level."""
+    return 360.0 / (TILE_SIZE_PX * 2 ** zoom)
+
+
+class BBoxIndex:
+    """
+    Uniform grid index for rectangle queries over points (e.g. school locations).
+    Points are sorted by grid cell in row-major order, so the cells of one grid row inside a
+    query box form one contiguous slice of the sorted array.
+    """
+
+    def __init__(self, lons, lats, cell_deg=0.05):
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.cell_deg = cell_deg
+        if len(self.lons):
+            self.min_lon, self.min_lat = self.lons.min(), self.lats.min()
+        else:
+            self.min_lon = self.min_lat = 0.0
+        cols = self._col(self.lons)
+        rows = self._row(self.lats)
+        self.n_cols = int(cols.max()) + 1 if len(cols) else 1
+        self.n_rows = int(rows.max()) + 1 if len(rows) else 1
+        cell = rows * self.n_cols + cols
+        self.order = np.argsort(cell, kind='stable')
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(cell, minlength=self.n_rows * self.n_cols))])
+
+    def _col(self, lons):
+        return np.floor((lons - self.min_lon) / self.cell_deg).astype(np.intp)
+
+    def _row(self, lats):
+        return np.floor((lats - self.min_lat) / self.cell_deg).astype(np.intp)
+
+    def query(self, bbox):
+        """Sorted indices of the points inside bbox = (min_lon, min_lat, max_lon, max_lat); all points for None."""
+        if bbox is None:
+            return np.arange(len(self.lons))
+        min_lon, min_lat, max_lon, max_lat = bbox
+        col0 = max(int(np.floor((min_lon - self.min_lon) / self.cell_deg)), 0)
+        col1 = min(int(np.floor((max_lon - self.min_lon) / self.cell_deg)), self.n_cols - 1)
+        row0 = max(int(np.floor((min_lat - self.min_lat) / self.cell_deg)), 0)
+        row1 = min(int(np.floor((max_lat - self.min_lat) / self.cell_deg)), self.n_rows - 1)
+        if col0 > col1 or row0 > row1:
+            return np.empty(0, dtype=np.intp)
+        slices = [self.order[self.offsets[row * self.n_cols + col0]:self.offsets[row * self.n_cols + col1 + 1]]
+                  for row in range(row0, row1 + 1)]
+        candidates = np.concatenate(slices)
+        lons, lats = self.lons[candidates], self.lats[candidates]
+        inside = (lons >= min_lon) & (lons <= max_lon) & (lats >= min_lat) & (lats <= max_lat)
+        return np.sort(candidates[inside])
+
+    def nearest(self, lon, lat, max_distance_deg):
+        """
+        Index of the point closest to (lon, lat) within max_distance_deg, or None.
+        Used to resolve a map click to a school; longitude differences are scaled by cos(lat).
+        """
+        candidates = self.query((lon - max_distance_deg, lat - max_distance_deg,
+                                 lon + max_distance_deg, lat + max_distance_deg))
+        if not len(candidates):
+            return None
+        dx = (self.lons[candidates] - lon) * np.cos(np.radians(lat))
+        dy = self.lats[candidates] - lat
+        distance = np.hypot(dx, dy)
+        best = np.argmin(distance)
+        return int(candidates[best]) if distance[best] <= max_distance_deg else None
+
+
+def aggregate_points(lons, lats, classes, cell_deg):
+    """
+    Coarse aggregates for low zoom: one row per (grid cell, class) with the mean position and count.
+    Returns:
+        DataFrame: lat, lng, class and n columns
+    """
+    frame = pd.DataFrame({
+        'row': np.floor(np.asarray(lats, dtype=np.float64) / cell_deg).astype(np.int64),
+        'col': np.floor(np.asarray(lons, dtype=np.float64) / cell_deg).astype(np.int64),
+        'class': np.asarray(classes),
+        'lat': lats,
+        'lng': lons,
+    })
+    grouped = frame.groupby(['row', 'col', 'class'], sort=False, observed=True)
+    return grouped.agg(lat=('lat', 'mean'), lng=('lng', 'mean'), n=('lat', 'size')).reset_index()[
+        ['lat', 'lng', 'class', 'n']]